@@ -0,0 +1,354 @@
+'''
+Benchmarks for the stages of commtower.py, so changes to the
+simulation can be timed against each other.
+
+Every case runs in its own child process with a fixed seed. The child
+reports the best wall time over a few repeats and how far its peak
+memory rose during the calls. The peak is reset after setup through
+/proc/self/clear_refs, so it is only measured on Linux; elsewhere it is
+reported as None. A case that fails is reported with its traceback
+instead of hanging the run. Results are saved as a JSON list and can
+be checked against a stored baseline for regressions.
+
+:@funct run_benchmarks: time every stage over sizes, fills and samples
+:@funct compare_to_baseline: flag cases slower than a stored baseline
+'''
+
+import commtower as ct
+import trimmingplots as tp
+
+
+STAGES = ['plot_land', 'make_random_tower', 'remove_overlap', \
+          'get_largest_rectangle', 'trimmingplots.get_largest_rectangle', \
+          'plot_ntowers', 'sample_towersToFill']
+
+
+def _plot_at_fill(L, W, fill, rng):
+    '''
+    Makes a plot covered by randomly placed, trimmed towers up to at
+    least the given fraction of its area, plus one random tower that
+    still adds new coverage to it.
+    
+    :@param L: int, number of rows in the plot
+    :@param W: int, number of columns in the plot
+    :@param fill: float, fraction of the plot to cover, 0 to below 1
+    :@param rng: RandomState, random stream
+    :@return: tuple, (plot array, tower array)
+    '''
+    assert 0 <= fill < 1, "fill must be at least 0 and below 1"
+    
+    mainPlot = ct.plot_land(L, W)
+    while mainPlot.sum() < fill * L * W:
+        rect = ct.make_random_rect(L, W, rng)
+        trimRect = ct.get_largest_rect( \
+                   ct.remove_overlap_rect(rect, mainPlot), rect, rng=rng)
+        if trimRect is not None:
+            r1, r2, c1, c2 = trimRect
+            mainPlot[r1:r2+1, c1:c2+1] = 1
+    
+    while True: #a tower with something left to cover
+        r1, r2, c1, c2 = ct.make_random_rect(L, W, rng)
+        if not mainPlot[r1:r2+1, c1:c2+1].all():
+            break
+    towerPlot = mainPlot * 0
+    towerPlot[r1:r2+1, c1:c2+1] = 1
+    return mainPlot, towerPlot
+
+
+
+def _stage_call(case, rng):
+    '''
+    Sets up the inputs of one benchmark case and returns the call to
+    time, so that setup is left out of the timing.
+    
+    :@param case: dict, 'stage', 'L', 'W', 'fill', 'n' and 'engine'
+    :@param rng: RandomState, random stream for the inputs
+    :@return: function, no arguments, runs the stage once
+    '''
+    stage, L, W = case['stage'], case['L'], case['W']
+    engine = case.get('engine', 'array')
+    
+    if stage == 'plot_land':
+        return lambda: ct.plot_land(L, W)
+    elif stage == 'plot_ntowers':
+        return lambda: ct.plot_ntowers(L, W, 0, engine, rng=rng)
+    elif stage == 'sample_towersToFill':
+        seed = int( rng.randint(0, 2**31 - 1) )
+        return lambda: ct.sample_towersToFill(L, W, case['n'], engine, \
+                                              seed=seed)
+    
+    mainPlot, towerPlot = _plot_at_fill(L, W, case.get('fill', 0.0), rng)
+    overlapFree = ct.remove_overlap(towerPlot, mainPlot)
+    if stage == 'make_random_tower':
+        return lambda: ct.make_random_tower(mainPlot, rng=rng)
+    elif stage == 'remove_overlap':
+        return lambda: ct.remove_overlap(towerPlot, mainPlot)
+    elif stage == 'get_largest_rectangle':
+        return lambda: ct.get_largest_rectangle(overlapFree, rng=rng)
+    elif stage == 'trimmingplots.get_largest_rectangle':
+        return lambda: tp.get_largest_rectangle(overlapFree)
+        #uses the global state, seeded by _bench_child
+    else:
+        raise ValueError("Unknown stage: %s" % stage)
+
+
+
+def _memory_kb(field):
+    '''
+    Reads one memory figure of this process from /proc/self/status.
+    
+    :@param field: str, such as 'VmRSS' (resident) or 'VmHWM' (its peak)
+    :@return: int, kilobytes; None if /proc is not there
+    '''
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith(field + ':'):
+                    return int( line.split()[1] )
+    except IOError:
+        pass
+    return None
+
+
+
+def _reset_peak():
+    '''
+    Resets the peak resident memory of this process to what it uses
+    now, so a later VmHWM only covers what ran since.
+    
+    :@return: bool, True if the peak could be reset
+    '''
+    try:
+        with open('/proc/self/clear_refs', 'w') as clearRefs:
+            clearRefs.write('5')
+    except IOError:
+        return False
+    return True
+
+
+
+def _bench_child(queue, case, seed, repeat):
+    '''
+    Runs one benchmark case inside a child process and puts the result
+    on the queue: best time in seconds and the largest rise of the
+    resident memory in kilobytes during a call, or None where the peak
+    can't be reset. If the case fails, its traceback is put on the
+    queue instead.
+    
+    :@param queue: multiprocessing.Queue, where the result goes
+    :@param case: dict, benchmark case, see _stage_call
+    :@param seed: int, seed for the inputs and the stage
+    :@param repeat: int, number of timed calls
+    '''
+    import time
+    import traceback
+    import numpy as np
+    
+    try:
+        np.random.seed(seed)
+        stageCall = _stage_call(case, np.random.RandomState(seed))
+        
+        bestTime = None
+        peakKB = None
+        for i in range(repeat):
+            canReset = _reset_peak() #drop the peak left by setup
+            startKB = _memory_kb('VmRSS')
+            start = time.time()
+            stageCall()
+            elapsed = time.time() - start
+            endPeak = _memory_kb('VmHWM')
+            if bestTime is None or elapsed < bestTime:
+                bestTime = elapsed
+            if canReset and startKB is not None and endPeak is not None:
+                peakKB = max(peakKB, endPeak - startKB)
+    except Exception:
+        queue.put( ('error', traceback.format_exc()) )
+        return
+    
+    queue.put( ('ok', bestTime, peakKB) )
+
+
+
+def bench_case(case, seed=0, repeat=3):
+    '''
+    Times one benchmark case in a fresh child process, so that memory
+    left over from other cases doesn't hide its peak.
+    
+    :@param case: dict, 'stage', 'L', 'W' and, where used, 'fill', 'n'
+                  and 'engine'
+    :@param seed: int, seed for the inputs and the stage
+    :@param repeat: int, number of timed calls; the best one is kept
+    :@return: dict, the case plus 'seed', 'seconds' and 'peakKB'; the
+              latter None where peak memory can't be measured
+    '''
+    import multiprocessing
+    import Queue
+    
+    assert case['stage'] in STAGES, "Unknown stage: %s" % case['stage']
+    
+    queue = multiprocessing.Queue()
+    child = multiprocessing.Process(target=_bench_child, \
+                                    args=(queue, case, seed, repeat))
+    child.start()
+    while True:
+        try:
+            message = queue.get(timeout=1.0)
+            break
+        except Queue.Empty:
+            if not child.is_alive() and queue.empty():
+                #died without a word, e.g. killed for using too much memory
+                raise RuntimeError("Benchmark %s died, exit code %s" % \
+                                   (case, child.exitcode))
+    child.join()
+    if message[0] == 'error':
+        raise RuntimeError("Benchmark %s failed:\n%s" % (case, message[1]))
+    seconds, peakKB = message[1:]
+    
+    result = dict(case)
+    result.update( {'seed': seed, 'seconds': seconds, 'peakKB': peakKB} )
+    return result
+
+
+
+def make_cases(sizes, fills, samples, engines=('array',)):
+    '''
+    Lists benchmark cases for every stage over the given plot sizes.
+    The per-tower stages run at every fill level, plot_ntowers and
+    sample_towersToFill with every engine, and the latter at every
+    sample count.
+    
+    :@param sizes: list, (L, W) plot dimensions
+    :@param fills: list, fill levels for the per-tower stages
+    :@param samples: list, sample counts for sample_towersToFill
+    :@param engines: list, plot_ntowers engines to time
+    :@return: list, benchmark case dicts
+    '''
+    cases = []
+    for L, W in sizes:
+        cases.append( {'stage': 'plot_land', 'L': L, 'W': W} )
+        for stage in STAGES[1:5]:
+            for fill in fills:
+                cases.append( {'stage': stage, 'L': L, 'W': W, \
+                               'fill': fill} )
+        for engine in engines:
+            cases.append( {'stage': 'plot_ntowers', 'L': L, 'W': W, \
+                           'engine': engine} )
+            for n in samples:
+                cases.append( {'stage': 'sample_towersToFill', 'L': L, \
+                               'W': W, 'n': n, 'engine': engine} )
+    return cases
+
+
+
+def _case_key(result):
+    '''
+    Identifies a case across runs, leaving out the measurements.
+    
+    :@param result: dict, output of bench_case
+    :@return: tuple, sorted (name, value) pairs of the case
+    '''
+    return tuple( sorted( (k, v) for k, v in result.items() \
+                          if k not in ('seconds', 'peakKB') ) )
+
+
+
+def compare_to_baseline(results, baseline, threshold=0.25):
+    '''
+    Finds cases that got slower than a stored baseline by more than the
+    threshold. Cases missing from the baseline are skipped.
+    
+    :@param results: list, output of run_benchmarks
+    :@param baseline: list, an earlier output of run_benchmarks
+    :@param threshold: float, allowed slowdown; 0.25 means 25 percent
+    :@return: list, (result, baseline seconds) pairs that regressed
+    '''
+    baseTimes = dict( (_case_key(old), old['seconds']) for old in baseline )
+    
+    regressions = []
+    for result in results:
+        oldTime = baseTimes.get( _case_key(result) )
+        if oldTime is not None \
+           and result['seconds'] > oldTime * (1 + threshold):
+            regressions.append( (result, oldTime) )
+    return regressions
+
+
+
+def run_benchmarks(sizes=((8, 8), (16, 16), (32, 32)), \
+                   fills=(0.0, 0.5, 0.9), samples=(10,), \
+                   engines=('array', 'rect'), seed=0, repeat=3, \
+                   outFile=None, baselineFile=None, threshold=0.25):
+    '''
+    Times every commtower stage, and trimmingplots' trimming, over the
+    given plot sizes, fill levels and sample counts, one child process
+    per case.
+    
+    Results are saved to outFile as JSON if given. If baselineFile is
+    given, each regression beyond the threshold is printed.
+    
+    :@param sizes: list, (L, W) plot dimensions
+    :@param fills: list, fill levels for the per-tower stages
+    :@param samples: list, sample counts for sample_towersToFill
+    :@param engines: list, plot_ntowers engines to time
+    :@param seed: int, seed for every case
+    :@param repeat: int, timed calls per case; the best one is kept
+    :@param outFile: str, path to save results to; optional
+    :@param baselineFile: str, path of earlier results; optional
+    :@param threshold: float, allowed slowdown against the baseline
+    :@return: tuple, (results, regressions)
+    '''
+    import json
+    
+    results = [ bench_case(case, seed, repeat) \
+                for case in make_cases(sizes, fills, samples, engines) ]
+    
+    if outFile is not None:
+        with open(outFile, 'w') as out:
+            json.dump(results, out, indent=1, sort_keys=True)
+    
+    regressions = []
+    if baselineFile is not None:
+        with open(baselineFile) as base:
+            regressions = compare_to_baseline(results, json.load(base), \
+                                              threshold)
+        for result, oldTime in regressions:
+            print "REGRESSION %s %dx%d: %.4fs, baseline %.4fs" % \
+                  (result['stage'], result['L'], result['W'], \
+                   result['seconds'], oldTime)
+    
+    return results, regressions
+
+
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', default='8x8,16x16,32x32', \
+                        help='comma separated LxW plot sizes')
+    parser.add_argument('--fills', default='0,0.5,0.9')
+    parser.add_argument('--samples', default='10')
+    parser.add_argument('--engines', default='array,rect')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--out', default=None)
+    parser.add_argument('--baseline', default=None)
+    parser.add_argument('--threshold', type=float, default=0.25)
+    args = parser.parse_args()
+    
+    sizes = [ tuple( int(d) for d in size.split('x') ) \
+              for size in args.sizes.split(',') ]
+    results, regressions = run_benchmarks( \
+        sizes, [ float(f) for f in args.fills.split(',') ], \
+        [ int(n) for n in args.samples.split(',') ], \
+        args.engines.split(','), args.seed, args.repeat, \
+        args.out, args.baseline, args.threshold)
+    
+    for result in results:
+        print "%-38s %4dx%-4d %-24s %10.5fs %8s KB" % \
+              (result['stage'], result['L'], result['W'], \
+               ' '.join( '%s=%s' % (k, result[k]) for k in \
+                         ('fill', 'n', 'engine') if k in result ), \
+               result['seconds'], result['peakKB'])
+    if regressions:
+        raise SystemExit(1)
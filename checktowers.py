@@ -0,0 +1,615 @@
+'''
+Differential checks of the fast paths in commtower.py against the
+reference code they replace, on seeded random inputs.
+
+Each check draws its inputs from its own seeded stream, runs a
+reference and every alternative on them, and reports any difference.
+Plot shapes include degenerate 1xN, Nx1 and 1x1 plots, and plots that
+are empty, partly covered or fully covered. Where the same random
+stream gives the same draws, outputs must match exactly. Where an
+alternative draws differently (fastForward, the batch engine), a
+two-sample Kolmogorov-Smirnov test compares the distributions. On small
+plots, sampled towers-to-fill are also tested against the exact
+distribution from exacttowers.
+
+run_checks cycles through CHECKS until its time budget runs out, so
+the same harness serves as a quick smoke test or an overnight run. The
+statistical tests get stricter with every run, so a long run doesn't
+pile up false failures. A new fast path is covered by adding a check
+function to CHECKS.
+
+:@funct run_checks: run every check until the time budget is spent
+:@funct ks_two_sample: two-sample Kolmogorov-Smirnov test
+'''
+
+import commtower as ct
+import trimmingplots as tp
+
+
+SHAPES = [(1, 1), (1, 7), (7, 1), (2, 9), (9, 2), (5, 5), (8, 11)]
+FILLS = [0.0, 0.5, 0.9, 1.0]
+COVERAGES = ['int32', 'bool', 'uint8', 'bits', 'index', 'intervals']
+EXACT_SHAPES = [(1, 1), (1, 5), (5, 1), (2, 2), (2, 3), (3, 2), (3, 3)]
+
+
+def ks_two_sample(a, b):
+    '''
+    Two-sample Kolmogorov-Smirnov test, with the asymptotic p-value from
+    the Kolmogorov distribution. For discrete results, like tower
+    counts, the test is conservative: p-values come out too high.
+    
+    :@param a: list, first sample
+    :@param b: list, second sample
+    :@return: tuple, (D statistic, p-value)
+    '''
+    import numpy as np
+    
+    a = np.sort(a)
+    b = np.sort(b)
+    values = np.union1d(a, b)
+    D = np.abs( np.searchsorted(a, values, 'right') / float(len(a)) \
+                - np.searchsorted(b, values, 'right') / float(len(b)) ).max()
+    
+    nEff = len(a) * len(b) / float( len(a) + len(b) )
+    return D, _kolmogorov_p(D, nEff)
+
+
+
+def _kolmogorov_p(D, nEff):
+    '''
+    Asymptotic p-value of a Kolmogorov-Smirnov statistic.
+    
+    :@param D: float, largest gap between the two CDFs
+    :@param nEff: float, effective sample size
+    :@return: float, p-value
+    '''
+    import numpy as np
+    
+    lam = (np.sqrt(nEff) + 0.12 + 0.11 / np.sqrt(nEff)) * D
+    if lam < 0.2:
+        return 1.0 #series converges badly; p is 1 to many digits
+    k = np.arange(1, 101)
+    p = 2 * np.sum( (-1.0)**(k - 1) * np.exp(-2 * k**2 * lam**2) )
+    return float( min(max(p, 0.0), 1.0) )
+
+
+
+def _random_shape(rng):
+    '''
+    Picks a plot shape: a degenerate one from SHAPES or a random one.
+    
+    :@param rng: RandomState, random stream
+    :@return: tuple, (L, W)
+    '''
+    if rng.randint(0, 2) == 0:
+        return SHAPES[ rng.randint(0, len(SHAPES)) ]
+    return int( rng.randint(1, 13) ), int( rng.randint(1, 13) )
+
+
+
+def _random_cover(L, W, fill, rng):
+    '''
+    Covers a plot up to a fill level with non-overlapping rectangles,
+    as plot_ntowers would place them. A fill of 1 is a single rectangle
+    over the whole plot.
+    
+    :@param L: int, number of rows in the plot
+    :@param W: int, number of columns in the plot
+    :@param fill: float, fraction of the plot to cover
+    :@param rng: RandomState, random stream
+    :@return: list, (row1, row2, col1, col2) of the placed rectangles
+    '''
+    if fill >= 1:
+        return [ (0, L - 1, 0, W - 1) ]
+    
+    mainPlot = ct.plot_land(L, W, 'bool')
+    rects = []
+    while mainPlot.sum() < fill * L * W:
+        rect = ct.make_random_rect(L, W, rng)
+        trimRect = ct.get_largest_rect( \
+                   ct.remove_overlap_rect(rect, mainPlot), rect, \
+                   'histogram', rng=rng)
+        if trimRect is not None:
+            ct._cover_rect(mainPlot, trimRect, 'bool')
+            rects.append(trimRect)
+    return rects
+
+
+
+def _random_inputs(rng):
+    '''
+    Draws the inputs of the per-tower checks: a covered plot and a
+    random tower on it.
+    
+    :@param rng: RandomState, random stream
+    :@return: tuple, (L, W, placed rectangles, tower rectangle, case
+              description)
+    '''
+    L, W = _random_shape(rng)
+    fill = FILLS[ rng.randint(0, len(FILLS)) ]
+    rects = _random_cover(L, W, fill, rng)
+    rect = ct.make_random_rect(L, W, rng)
+    return L, W, rects, rect, "%dx%d fill %.1f tower %s" % \
+                              (L, W, fill, rect)
+
+
+
+def _build_plot(L, W, rects, coverage):
+    '''
+    Makes a main plot for any coverage backend of plot_ntowers from a
+    list of placed rectangles.
+    
+    :@param L: int, number of rows in the plot
+    :@param W: int, number of columns in the plot
+    :@param rects: list, (row1, row2, col1, col2) of placed rectangles
+    :@param coverage: str, coverage backend
+    :@return: ndarray or dict, main plot or tower index
+    '''
+    if coverage == 'index':
+        mainPlot = ct.make_tower_index(L, W)
+    elif coverage == 'intervals':
+        mainPlot = ct.make_interval_plot(L, W)
+    else:
+        mainPlot = ct.plot_land(L, W, coverage)
+    for rect in rects:
+        ct._cover_rect(mainPlot, rect, coverage)
+    return mainPlot
+
+
+
+def _tower_array(L, W, rect):
+    '''
+    Array version of a rectangle, as the array engine holds towers.
+    
+    :@param L: int, number of rows in the plot
+    :@param W: int, number of columns in the plot
+    :@param rect: tuple, (row1, row2, col1, col2); None for no coverage
+    :@return: ndarray, int32, ones inside the rectangle
+    '''
+    towerPlot = ct.plot_land(L, W)
+    if rect is not None:
+        r1, r2, c1, c2 = rect
+        towerPlot[r1:r2+1, c1:c2+1] = 1
+    return towerPlot
+
+
+
+def check_overlap(rng):
+    '''
+    remove_overlap against the tower window of every coverage backend.
+    
+    :@param rng: RandomState, random stream for the inputs
+    :@return: list, descriptions of mismatches
+    '''
+    import numpy as np
+    
+    L, W, rects, rect, case = _random_inputs(rng)
+    reference = ct.remove_overlap(_tower_array(L, W, rect), \
+                                  _build_plot(L, W, rects, 'int32'))
+    
+    failures = []
+    r1, r2, c1, c2 = rect
+    expected = reference[r1:r2+1, c1:c2+1] != 0
+    for coverage in COVERAGES:
+        window = ct._coverage_window(_build_plot(L, W, rects, coverage), \
+                                     rect, coverage)
+        if not np.array_equal(window, expected):
+            failures.append("%s window differs, %s" % (coverage, case))
+    return failures
+
+
+
+def check_trim(rng):
+    '''
+    Trimming by trimmingplots (the original code), by the array and
+    rect versions of both methods, by the array sweep with a summed-area
+    table, and by the histogram on intervals, on the same free region
+    and the same random stream for ties. The histogram area is also
+    checked to be the true largest area, found by brute force.
+    
+    :@param rng: RandomState, random stream for the inputs
+    :@return: list, descriptions of mismatches
+    '''
+    import numpy as np
+    
+    L, W, rects, rect, case = _random_inputs(rng)
+    overlapFree = ct.remove_overlap(_tower_array(L, W, rect), \
+                                    _build_plot(L, W, rects, 'int32'))
+    r1, r2, c1, c2 = rect
+    window = overlapFree[r1:r2+1, c1:c2+1] != 0
+    tieSeed = int( rng.randint(0, 2**31 - 1) )
+    
+    failures = []
+    sweepArray = ct.get_largest_rectangle(overlapFree, 'sweep', \
+                                          rng=tieSeed)
+    if window.any():
+        np.random.seed(tieSeed) #trimmingplots uses the global state
+        if not np.array_equal(tp.get_largest_rectangle(overlapFree), \
+                              sweepArray):
+            failures.append("sweep differs from trimmingplots, %s" % case)
+    if not np.array_equal(ct.get_largest_rectangle(overlapFree, 'sweep', \
+                          rng=tieSeed, useTable=True), sweepArray):
+        failures.append("sweep with a table differs, %s" % case)
+    
+    for method in ('sweep', 'histogram'):
+        arrayOut = ct.get_largest_rectangle(overlapFree, method, \
+                                            rng=tieSeed)
+        rectOut = _tower_array(L, W, ct.get_largest_rect( \
+                               window, rect, method, rng=tieSeed))
+        if not np.array_equal(arrayOut, rectOut):
+            failures.append("%s array and rect engines differ, %s" % \
+                            (method, case))
+        if method == 'histogram' \
+           and arrayOut.sum() != _brute_force_area(window):
+            failures.append("histogram area is not the largest, %s" % case)
+    
+    intervalOut = _tower_array(L, W, ct.intervals_largest_rect( \
+                  ct.intervals_free(_build_plot(L, W, rects, 'intervals'), \
+                                    rect), rect, rng=tieSeed))
+    if not np.array_equal(intervalOut, arrayOut): #arrayOut of histogram
+        failures.append("histogram on intervals differs, %s" % case)
+    return failures
+
+
+
+def _brute_force_area(window):
+    '''
+    Largest all-True rectangle in a window, trying every rectangle.
+    
+    :@param window: ndarray, bool
+    :@return: int, its area
+    '''
+    table = ct.make_coverage_table(window)
+    length, width = window.shape
+    best = 0
+    for r1 in range(length):
+        for r2 in range(r1, length):
+            for c1 in range(width):
+                for c2 in range(c1, width):
+                    area = (r2 - r1 + 1) * (c2 - c1 + 1)
+                    if area > best and \
+                       ct.rect_coverage(table, (r1, r2, c1, c2)) == area:
+                        best = area
+    return best
+
+
+
+def check_fill(rng):
+    '''
+    plot_ntowers with the array engine against the rect engine with
+    every coverage backend and the summed-area table, on the same
+    random stream; counts must match exactly. A traced run must replay
+    to the covered area it reported.
+    
+    :@param rng: RandomState, random stream for the inputs
+    :@return: list, descriptions of mismatches
+    '''
+    L, W = _random_shape(rng)
+    n = [0, int( rng.randint(1, 2 * L * W + 2) )][ rng.randint(0, 2) ]
+    method = ['sweep', 'histogram'][ rng.randint(0, 2) ]
+    runSeed = int( rng.randint(0, 2**31 - 1) )
+    case = "%dx%d n=%d %s seed %d" % (L, W, n, method, runSeed)
+    
+    reference = ct.plot_ntowers(L, W, n, 'array', method, rng=runSeed)
+    variants = [ ('rect %s' % coverage, {'coverage': coverage}) \
+                 for coverage in COVERAGES ]
+    variants.append( ('rect useTable', {'useTable': True}) )
+    
+    failures = []
+    for name, options in variants:
+        result = ct.plot_ntowers(L, W, n, 'rect', method, rng=runSeed, \
+                                 **options)
+        if result != reference:
+            failures.append("%s gave %s, array gave %s, %s" % \
+                            (name, result, reference, case))
+    
+    trace = ct.new_tower_trace(L, W)
+    ct.plot_ntowers(L, W, n, 'rect', method, rng=runSeed, trace=trace)
+    covered = int( ct.replay_trace(ct.trace_events(trace), L, W).sum() )
+    if covered != (L * W if n == 0 else reference[0]):
+        failures.append("trace replays to %d cells, %s" % (covered, case))
+    return failures
+
+
+
+def check_unseeded(rng):
+    '''
+    The default calls without a seed, which draw from the global
+    np.random state, as the notebooks make them. The global state is
+    seeded from the input stream, so the array and rect engines must
+    still agree, and sample_towersToFill must give towers counts.
+    
+    :@param rng: RandomState, random stream for the inputs
+    :@return: list, descriptions of mismatches
+    '''
+    import numpy as np
+    
+    L, W = _random_shape(rng)
+    globalSeed = int( rng.randint(0, 2**31 - 1) )
+    case = "%dx%d global seed %d" % (L, W, globalSeed)
+    
+    failures = []
+    results = []
+    for engine in ['array', 'rect']:
+        np.random.seed(globalSeed)
+        results.append( ct.plot_ntowers(L, W) if engine == 'array' \
+                        else ct.plot_ntowers(L, W, 0, engine) )
+    if results[0] != results[1]:
+        failures.append("rect gave %s, array gave %s, %s" % \
+                        (results[1], results[0], case))
+    
+    np.random.seed(globalSeed)
+    samples = ct.sample_towersToFill(L, W, 3)
+    if len(samples) != 3 or min(samples) < 1:
+        failures.append("sample_towersToFill gave %s, %s" % \
+                        (samples, case))
+    return failures
+
+
+
+def check_fill_distribution(rng, samples=200, alpha=0.001):
+    '''
+    Towers to fill from the fast paths that draw random numbers in a
+    different order, fastForward and the batch engine, against plain
+    rect engine runs, by a two-sample KS test.
+    
+    :@param rng: RandomState, random stream for the inputs
+    :@param samples: int, runs per sample
+    :@param alpha: float, chance of a false report; split between the
+                   two tests
+    :@return: list, descriptions of mismatches
+    '''
+    L, W = _random_shape(rng)
+    seeds = [ int(s) for s in rng.randint(0, 2**31 - 1, 3) ]
+    case = "%dx%d seeds %s" % (L, W, seeds)
+    
+    reference = ct.sample_towersToFill(L, W, samples, 'rect', \
+                                       seed=seeds[0])
+    fastForward = [ ct.plot_ntowers(L, W, 0, 'rect', rng=stream, \
+                                    fastForward=True) \
+                    for stream in ct.split_seed(seeds[1], samples) ]
+    batch = ct.sample_towersToFill_batch(L, W, samples, seed=seeds[2])
+    
+    failures = []
+    for name, results in [('fastForward', fastForward), ('batch', batch)]:
+        D, p = ks_two_sample(reference, results)
+        if p < alpha / 2:
+            failures.append("%s distribution differs, D=%.3f p=%.2g, %s" \
+                            % (name, D, p, case))
+    return failures
+
+
+
+def check_exact(rng, samples=200, alpha=0.001):
+    '''
+    Towers to fill from seeded rect engine runs on a small plot against
+    the exact distribution from exacttowers, by a one-sample KS test.
+    
+    :@param rng: RandomState, random stream for the inputs
+    :@param samples: int, runs in the sample
+    :@param alpha: float, chance of a false report
+    :@return: list, descriptions of mismatches
+    '''
+    import numpy as np
+    import exacttowers as et
+    
+    L, W = EXACT_SHAPES[ rng.randint(0, len(EXACT_SHAPES)) ]
+    method = ['sweep', 'histogram'][ rng.randint(0, 2) ]
+    seed = int( rng.randint(0, 2**31 - 1) )
+    case = "%dx%d %s seed %d" % (L, W, method, seed)
+    
+    exact = et.exact_towersToFill(L, W, method)
+    results = np.sort( ct.sample_towersToFill(L, W, samples, 'rect', \
+                                              method, seed=seed) )
+    cdf = np.cumsum(exact['distribution'])
+    ecdf = np.searchsorted(results, np.arange(len(cdf)), 'right') \
+           / float(samples)
+    D = np.abs(cdf - ecdf).max()
+    p = _kolmogorov_p(D, samples)
+    if p < alpha:
+        return ["exact distribution differs, D=%.3f p=%.2g, %s" \
+                % (D, p, case)]
+    return []
+
+
+
+def check_cache(rng):
+    '''
+    towercache against fresh seeded sample_towersToFill runs. The cache
+    is filled, left with a partly written record as by an interrupted
+    append, and extended; the file must then hold exactly the new
+    samples. Eviction must delete the least recently used files first
+    and never one in keep.
+    
+    :@param rng: RandomState, random stream for the inputs
+    :@return: list, descriptions of mismatches
+    '''
+    import os
+    import shutil
+    import tempfile
+    import towercache as tc
+    
+    L, W = _random_shape(rng)
+    seed = int( rng.randint(0, 2**31 - 1) )
+    nFirst = int( rng.randint(1, 8) )
+    nAll = nFirst + int( rng.randint(1, 8) )
+    case = "%dx%d seed %d, %d then %d samples" % (L, W, seed, nFirst, nAll)
+    reference = ct.sample_towersToFill(L, W, nAll, 'rect', seed=seed)
+    
+    failures = []
+    cacheDir = tempfile.mkdtemp(prefix='checktowers')
+    try:
+        path = tc.cache_path(L, W, seed, cacheDir=cacheDir)
+        if tc.cached_towersToFill(L, W, nFirst, seed, \
+                                  cacheDir=cacheDir) != reference[:nFirst]:
+            failures.append("first fill differs, %s" % case)
+        with open(path, 'ab') as cacheFile:
+            cacheFile.write(b'\x01\x02') #interrupted append
+        if tc.cached_towersToFill(L, W, nAll, seed, \
+                                  cacheDir=cacheDir) != reference:
+            failures.append("extended results differ, %s" % case)
+        if os.path.getsize(path) != 4 * nAll:
+            failures.append("cache file has %d bytes, not %d, %s" % \
+                            (os.path.getsize(path), 4 * nAll, case))
+        if tc.cached_towersToFill(L, W, nFirst, seed, \
+                                  cacheDir=cacheDir) != reference[:nFirst]:
+            failures.append("stored results differ, %s" % case)
+        
+        paths = [ tc.cache_path(L, W, seed + k, cacheDir=cacheDir) \
+                  for k in range(1, 4) ]
+        for k, otherPath in enumerate(paths): #oldest use first
+            with open(otherPath, 'wb') as cacheFile:
+                cacheFile.write(b'\x00' * 4)
+            os.utime(otherPath, (1000 + k, 1000 + k))
+        os.utime(path, (1, 1)) #oldest of all, but kept
+        deleted = tc.evict_cache(cacheDir, 4 * (nAll + 1), keep=(path,))
+        if sorted(deleted) != sorted(paths[:2]):
+            failures.append("eviction deleted %s, %s" % \
+                            ([ os.path.basename(d) for d in deleted ], case))
+    finally:
+        shutil.rmtree(cacheDir)
+    return failures
+
+
+
+def check_sweep(rng):
+    '''
+    sweeptowers against fresh seeded sample_towersToFill runs. A sweep
+    is interrupted after its first job, with rows written past the
+    checkpoint as by a crash between the two, and then resumed. It must
+    run only the jobs left, and every plot size must end up with the
+    rows of a fresh run. Resuming with another seed must be refused.
+    
+    :@param rng: RandomState, random stream for the inputs
+    :@return: list, descriptions of mismatches
+    '''
+    import os
+    import shutil
+    import tempfile
+    import numpy as np
+    import sweeptowers as sw
+    
+    sizes = []
+    while len(sizes) < 3:
+        size = _random_shape(rng)
+        if size not in sizes:
+            sizes.append(size)
+    n = int( rng.randint(1, 6) )
+    seed = int( rng.randint(0, 2**31 - 1) )
+    workers = int( rng.randint(1, 3) )
+    case = "sizes %s n=%d seed %d workers %d" % (sizes, n, seed, workers)
+    
+    failures = []
+    outDir = tempfile.mkdtemp(prefix='checktowers')
+    try:
+        sw.sweep_towersToFill(sizes[:1], n, outDir, seed)
+        for name in sw.COLUMNS: #rows of a job that never checkpointed
+            with open(os.path.join(outDir, name + '.i32'), 'ab') as colFile:
+                colFile.write( np.arange(5, dtype='<i4').tostring() )
+        try:
+            sw.sweep_towersToFill(sizes, n, outDir, seed + 1, workers)
+            failures.append("resumed with another seed, %s" % case)
+        except AssertionError:
+            pass
+        jobs = sw.sweep_towersToFill(sizes, n, outDir, seed, workers)
+        if jobs != len(sizes) - 1:
+            failures.append("resume ran %d jobs, %s" % (jobs, case))
+        
+        columns = sw.load_sweep(outDir)
+        if len(columns['towers']) != n * len(sizes):
+            failures.append("%d rows, not %d, %s" % \
+                            (len(columns['towers']), n * len(sizes), case))
+        for L, W in sizes:
+            rows = (columns['L'] == L) & (columns['W'] == W)
+            order = np.argsort(columns['sample'][rows])
+            if list(columns['towers'][rows][order]) != \
+               ct.sample_towersToFill(L, W, n, 'rect', seed=seed):
+                failures.append("%dx%d results differ, %s" % (L, W, case))
+    finally:
+        shutil.rmtree(outDir)
+    return failures
+
+
+
+FAMILY_ALPHA = 0.001
+#Chance that run_checks reports a false failure from any one
+#statistical check, however long it runs.
+
+
+
+CHECKS = [('overlap', check_overlap), ('trim', check_trim), \
+          ('fill', check_fill), ('unseeded', check_unseeded), \
+          ('cache', check_cache), ('sweep', check_sweep), \
+          ('fill distribution', check_fill_distribution), \
+          ('exact', check_exact)]
+STATISTICAL = ['fill distribution', 'exact']
+#checks that take an alpha; see run_checks
+
+
+def run_checks(budget=10.0, seed=0, names=None):
+    '''
+    Runs the checks in CHECKS in turn, each with a fresh stream made
+    from (seed, round, check), until budget seconds have passed. Every
+    check runs at least once. A failure can be repeated by calling its
+    check with the stream named in the report.
+    
+    The statistical checks, listed in STATISTICAL, fail correct code
+    now and then by chance, and over a long run these false reports
+    would add up. Run k of such a check, counting from 1, is therefore
+    given alpha = FAMILY_ALPHA / (k * (k + 1)). These add up to
+    FAMILY_ALPHA, so an overnight run has no more chance of a false
+    report than a single round. Later runs only catch larger
+    differences.
+    
+    :@param budget: float, seconds to keep checking for
+    :@param seed: int, master seed of the inputs
+    :@param names: list, names of the checks to run; None for all
+    :@return: dict, 'runs' per check name and 'failures', a list of
+              (name, [seed, round, check], description)
+    '''
+    import time
+    import numpy as np
+    
+    checks = [ (k, name, check) for k, (name, check) in enumerate(CHECKS) \
+               if names is None or name in names ]
+    assert len(checks) > 0, "No checks named %s" % (names,)
+    
+    report = {'runs': dict( (name, 0) for k, name, check in checks ), \
+              'failures': []}
+    start = time.time()
+    roundNo = 0
+    while roundNo == 0 or time.time() - start < budget:
+        for k, name, check in checks:
+            streamSeed = [seed, roundNo, k]
+            options = {}
+            if name in STATISTICAL:
+                runNo = report['runs'][name] + 1
+                options['alpha'] = FAMILY_ALPHA / (runNo * (runNo + 1.0))
+            for failure in check( np.random.RandomState(streamSeed), \
+                                  **options ):
+                report['failures'].append( (name, streamSeed, failure) )
+            report['runs'][name] += 1
+        roundNo += 1
+    return report
+
+
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--budget', type=float, default=10.0, \
+                        help='seconds to keep checking for')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', default=None, \
+                        help='comma separated check names')
+    args = parser.parse_args()
+    
+    report = run_checks(args.budget, args.seed, \
+                        None if args.only is None else args.only.split(','))
+    for name in sorted(report['runs']):
+        print "%-20s %6d runs" % (name, report['runs'][name])
+    for name, streamSeed, failure in report['failures']:
+        print "FAIL %s %s: %s" % (name, streamSeed, failure)
+    if report['failures']:
+        raise SystemExit(1)
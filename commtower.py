@@ -7,8 +7,100 @@ towers and calculation of their resulting coverage.
 :@funct :
 '''
 
+CHECK_LEVEL = 'cheap'
+#How much invariant checking the functions do when checks=None:
+#'off'   - only argument checks that cost nothing
+#'cheap' - vectorized checks, a few per tower
+#'full'  - element-by-element checks, plus checks on every candidate
 
-def plot_land(L, W):
+ALGORITHM_VERSION = 1
+#Bump whenever a change alters which towers a seeded run places, so
+#results stored by towercache.py are not mixed across versions.
+
+TRACE_COLUMNS = ['run', 'r1', 'r2', 'c1', 'c2', 'trimR1', 'trimR2', \
+                 'trimC1', 'trimC2']
+#Row layout of a placement trace; see new_tower_trace.
+
+
+def _check_level(checks):
+    '''
+    Returns the check level a function should use. None means the
+    module-wide CHECK_LEVEL.
+    
+    :@param checks: str or None, 'off', 'cheap' or 'full'
+    :@return: str, the check level to use
+    '''
+    if checks is None:
+        checks = CHECK_LEVEL
+    assert checks in ('off', 'cheap', 'full'), \
+           "checks must be 'off', 'cheap' or 'full'"
+    return checks
+
+
+def _is_binary(plotArray):
+    '''
+    Vectorized test that an array only contains zeros and ones.
+    
+    :@param plotArray: ndarray, coverage plot
+    :@return: bool, True if every element is 0 or 1
+    '''
+    return bool( ((plotArray == 0) | (plotArray == 1)).all() )
+
+
+
+def make_rng(rng=None):
+    '''
+    Returns the random stream a function should draw from. Every rng
+    argument in this module goes through here, so each accepts None
+    for the global np.random state, a seed (int or list of ints) for a
+    fresh RandomState, or a RandomState to draw from directly.
+    
+    :@param rng: None, int, list or RandomState
+    :@return: RandomState, or the np.random module for None
+    '''
+    import numpy as np
+    
+    if rng is None or rng is np.random:
+        return np.random #global random state, or one passed on
+    if isinstance(rng, np.random.RandomState):
+        return rng
+    return np.random.RandomState(rng)
+
+
+
+def split_seed(seed, n, start=0):
+    '''
+    Splits one master seed into independent random streams, one per
+    sample or batch. Stream i is seeded from the pair (seed, i), the
+    same stream sample i of a seeded sample_towersToFill draws from,
+    so streams can be handed out to threads or processes in any order.
+    
+    :@param seed: int, master seed
+    :@param n: int, number of streams
+    :@param start: int, index of the first stream
+    :@return: list, RandomState streams start to start+n-1
+    '''
+    return [ _sample_rng(seed, i) for i in range(start, start + n) ]
+
+
+
+def _master_seed(seed):
+    '''
+    Master seed for the sampling functions. A RandomState (or the
+    global state module) given as seed supplies one by a single draw.
+    
+    :@param seed: None, int or RandomState
+    :@return: None or int
+    '''
+    import numpy as np
+    
+    if seed is None or isinstance(seed, (int, np.integer)):
+        return seed
+    return int( seed.randint(0, 2**31 - 1) )
+
+
+
+def plot_land(L, W, dtype='int32'):
     '''
     Given the dimensions, create a new plot of land that requires
     coverage by communication towers.
@@ -22,10 +114,14 @@ def plot_land(L, W):
     
     Then the function imports the numpy module before generating a
     two-dimensional array of zeros with L rows and W values in each row.
-    The zeros themselves are 32-bit integers.
+    The zeros themselves are 32-bit integers by default. A compact plot
+    can be asked for with dtype 'bool' or 'uint8' (one byte per cell),
+    or 'bits', where each row is bit-packed into ceil(W/8) bytes; see
+    bits_window, bits_set_rect and bits_count.
     
     :@param W: int, horizontal dimension of plot
     :@param L: int, vertical dimension of plot
+    :@param dtype: str, 'int32', 'bool', 'uint8' or 'bits'
     :@return: ndrray, int, zeros representing no coverage
     '''
     for dimension in [W, L]:
@@ -37,14 +133,105 @@ def plot_land(L, W):
     except:
         print "numpy module not found." #checking for numpy module
     
+    assert dtype in ('int32', 'bool', 'uint8', 'bits'), \
+           "dtype must be 'int32', 'bool', 'uint8' or 'bits'"
+    
     import numpy as np
-    emptyPlot = np.zeros((L, W), dtype='int32') #generate output array
+    if dtype == 'bits':
+        emptyPlot = np.zeros((L, (W + 7) // 8), dtype='uint8')
+        #8 cells per byte; padding bits at the row ends stay 0
+    else:
+        emptyPlot = np.zeros((L, W), dtype=dtype) #generate output array
     
     return emptyPlot
 
 
 
-def make_random_tower(plotArray):
+def _byte_span(c1, c2):
+    '''
+    Bytes of a bit-packed row that hold columns c1 to c2.
+    
+    :@param c1: int, first column
+    :@param c2: int, last column
+    :@return: tuple, (first byte, last byte), inclusive
+    '''
+    return c1 // 8, c2 // 8
+
+
+
+def bits_window(bitPlot, rect):
+    '''
+    Unpacks the part of a bit-packed plot under a rectangle. Only the
+    bytes covering the rectangle's columns are unpacked.
+    
+    Numpy module must be available to function.
+    
+    :@param bitPlot: ndarray, uint8, plot from plot_land(L, W, 'bits')
+    :@param rect: tuple, (row1, row2, col1, col2), inclusive ranges
+    :@return: ndarray, bool, coverage inside the rectangle
+    '''
+    import numpy as np
+    
+    r1, r2, c1, c2 = rect
+    b1, b2 = _byte_span(c1, c2)
+    bits = np.unpackbits(bitPlot[r1:r2+1, b1:b2+1], axis=1)
+    return bits[:, c1 - 8*b1 : c2 - 8*b1 + 1].astype('bool')
+
+
+
+def bits_set_rect(bitPlot, rect):
+    '''
+    Marks every cell of a rectangle as covered in a bit-packed plot, in
+    place. One packed row mask is built for the rectangle's bytes and
+    OR-ed into all of its rows at once.
+    
+    :@param bitPlot: ndarray, uint8, plot from plot_land(L, W, 'bits')
+    :@param rect: tuple, (row1, row2, col1, col2), inclusive ranges
+    '''
+    import numpy as np
+    
+    r1, r2, c1, c2 = rect
+    b1, b2 = _byte_span(c1, c2)
+    rowMask = np.zeros(8 * (b2 - b1 + 1), dtype='bool')
+    rowMask[c1 - 8*b1 : c2 - 8*b1 + 1] = True
+    bitPlot[r1:r2+1, b1:b2+1] |= np.packbits(rowMask)
+
+
+
+def bits_rect_coverage(bitPlot, rect):
+    '''
+    Number of covered cells inside a rectangle of a bit-packed plot.
+    
+    :@param bitPlot: ndarray, uint8, plot from plot_land(L, W, 'bits')
+    :@param rect: tuple, (row1, row2, col1, col2), inclusive ranges
+    :@return: int, covered cells in the rectangle
+    '''
+    return int( bits_window(bitPlot, rect).sum() )
+
+
+
+def bits_count(bitPlot, blockRows=256):
+    '''
+    Counts the covered cells in a bit-packed plot with a 256-entry
+    popcount table, one lookup per byte. The lookups are done a block of
+    rows at a time, so the temporary stays small next to the plot.
+    
+    :@param bitPlot: ndarray, uint8, plot from plot_land(L, W, 'bits')
+    :@param blockRows: int, rows to look up at a time
+    :@return: int, number of covered cells
+    '''
+    import numpy as np
+    
+    popcount = np.unpackbits( np.arange(256, dtype='uint8')[:, None], \
+                              axis=1).sum(axis=1).astype('uint8')
+    covered = 0
+    for i in range(0, len(bitPlot), blockRows):
+        covered += int( popcount[bitPlot[i:i+blockRows]].sum(dtype='int64') )
+    return covered
+
+
+
+def make_random_tower(plotArray, checks=None, rng=None):
     '''
     Generates a random rectangle representing one tower's coverage in a
     given plot of land. Does not deal with overlapping and trimming.
@@ -57,20 +244,22 @@ def make_random_tower(plotArray):
     combined in a tuple that describes the ranges, inclusive, in which
     the final rectangle will be.
     
-    An array of the same dimensions as the input is generated. It is
-    made iterable by np.nditer(). By iterating element-wise and
-    comparing each element's row and column indices to the rectangle
-    ranges, the function finds the nodes that should be ones and
-    leaves the remainder as zeros.
+    An array of zeros of the same dimensions as the input is generated
+    and the rectangle ranges are set to one with a single slice write,
+    so only the tower's cells are touched.
     
     The output array is checked for correct dimensions and whether it
-    only contains zeros and ones. It is then returned as the output.
+    only contains zeros and ones, unless checks is 'off'. It is then
+    returned as the output.
     
     :@param plotArray: ndarray, dimensions represent a plot of land
+    :@param checks: str, check level; None uses CHECK_LEVEL
+    :@param rng: RandomState or seed, random stream; see make_rng
     :@return: ndarray, plot with random coverage rectangle mapped out
     '''
     import numpy as np #used for arrays and random integers
     
+    level = _check_level(checks)
     assert isinstance(plotArray, np.ndarray), \
            "Input must be a two-dimensional numpy array."
            #check if a numpy array
@@ -80,8 +269,9 @@ def make_random_tower(plotArray):
     
     L, W = plotArray.shape #save row number as L and cols as W
     
-    rectW = list( np.random.randint(0, W, 2) )
-    rectL = list( np.random.randint(0, L, 2) )
+    rng = make_rng(rng)
+    rectW = list( rng.randint(0, W, 2) )
+    rectL = list( rng.randint(0, L, 2) )
     #picks two values per dimension, determines range of length & width
     rectW.sort()
     rectL.sort()
@@ -91,45 +281,43 @@ def make_random_tower(plotArray):
     #Combine coords in pattern of (row1, row2, col1, col2)
     assert bool(len(rectRange) == 4) #Checking shape of output
     
-    rectPlot = plotArray * 0 #new zeros array; gets reactangle of one's
-    
-    iterPlot = np.nditer( \
-               rectPlot, flags=['multi_index'], op_flags=['writeonly'])
-    #Make iterable version of input plot array
-    #Flag args provide multiple indices and permits writing in data
-    while not iterPlot.finished: #loop through each element in array
-        i,j = iterPlot.multi_index #save indices in i & j
-        if rectRange[0] <= i <= rectRange[1] \
-           and rectRange[2] <= j <= rectRange[3]:
-            #testing for each position if in tower coverage
-            iterPlot[0] = 1 #If in range, change value to a one
-        iterPlot.iternext() #moves to next element in array
-    
-    assert bool(rectPlot.shape == plotArray.shape)
-    #final array output should be the same shape as the input
-    assert bool( 0 < np.sum(rectPlot) == \
-           (rectRange[1]-rectRange[0] +1) \
-           * (rectRange[3]-rectRange[2] +1) )
-    #check that the correct, non-zero area of coverage has been plotted
+    rectPlot = np.zeros(plotArray.shape, dtype=plotArray.dtype)
+    #new zeros array; gets reactangle of one's
+    r1, r2, c1, c2 = rectRange
+    rectPlot[r1:r2+1, c1:c2+1] = 1 #tower coverage in one slice write
+    
+    if level != 'off':
+        assert bool(rectPlot.shape == plotArray.shape)
+        #final array output should be the same shape as the input
+        checked = rectPlot if level == 'full' \
+                  else rectPlot[r1:r2+1, c1:c2+1]
+        assert bool( 0 < np.sum(checked) == \
+               (rectRange[1]-rectRange[0] +1) \
+               * (rectRange[3]-rectRange[2] +1) )
+        #check that the correct, non-zero area of coverage was plotted
     return rectPlot
 
 
 
-def remove_overlap(towerPlot, totalPlot):
+def remove_overlap(towerPlot, totalPlot, checks=None, \
+                   coveredArea=None):
     '''
     Locate where a new tower range overlaps with pre-existing coverage.
     Imports numpy and asserts that inputs are numpy arrays of the same
     dimensions. It then checks whether only zeros or ones are in the
-    arrays.
+    arrays: element by element if checks is 'full', in one vectorized
+    test if 'cheap', not at all if 'off'.
     
     Numpy module must be available to function.
     
     If totalPlot, the pre-existing coverage, only has zeros, the tower
-    plot is simply returned. Otherwise, the function continues to
-    combining both input plots. The tower plot is multiplied by 2 and
-    added to the pre-existing coverage. Thus, values of 2 in the
-    new layerPlot indicate coverage from the tower that does not
-    overlap with the pre-existing coverage.
+    plot is simply returned. A caller that keeps count of the covered
+    area can pass it as coveredArea so the plot isn't scanned for this.
+    Otherwise, the function continues to combining both input plots.
+    The tower plot is multiplied by 2 and added to the pre-existing
+    coverage. Thus, values of 2 in the new layerPlot indicate coverage
+    from the tower that does not overlap with the pre-existing
+    coverage.
     
     To generate the output, the function iterates element-wise over the
     layerPlot and replaces 2's with one and everything else with zero.
@@ -138,25 +326,36 @@ def remove_overlap(towerPlot, totalPlot):
     
     :@param towerPlot: ndarray, coverage for a random tower
     :@param totalPlot: ndarray, pre-existing coverage in a plot
+    :@param checks: str, check level; None uses CHECK_LEVEL
+    :@param coveredArea: int, cells covered in totalPlot, if known
     :@return: ndarray, new area covered by tower
     '''
     import numpy as np
     
+    level = _check_level(checks)
     assert isinstance(towerPlot, np.ndarray), \
            "Tower input not a numpy array"
     assert isinstance(totalPlot, np.ndarray), \
            "Pre-existing plot input not a numpy array"
     assert bool(towerPlot.shape == totalPlot.shape), \
            "Inputs must be the same dimensions"
-    for coord in np.nditer(towerPlot):#loop thorugh each element
-        assert bool(coord == 0 or coord == 1), \
+    if level == 'full':
+        for coord in np.nditer(towerPlot):#loop thorugh each element
+            assert bool(coord == 0 or coord == 1), \
+                   "Tower input array may only contain 0s or 1s"
+        for coord in np.nditer(totalPlot): #loop thorugh each element
+            assert bool(coord == 0 or coord == 1), \
+                   "Tower input array may only contain 0s or 1s"
+    elif level == 'cheap':
+        assert _is_binary(towerPlot), \
                "Tower input array may only contain 0s or 1s"
-    for coord in np.nditer(totalPlot): #loop thorugh each element
-        assert bool(coord == 0 or coord == 1), \
+        assert _is_binary(totalPlot), \
                "Tower input array may only contain 0s or 1s"
     
-    if np.array_equal(totalPlot, np.zeros( totalPlot.shape )):
-        #compares input to same-dimension array of zeros
+    if coveredArea is None:
+        coveredArea = 0 if not totalPlot.any() else None
+        #no allocation; only tells an empty plot apart from the rest
+    if coveredArea == 0:
         return towerPlot
         #If there is no coverage already, just return the new coverage
     else:
@@ -175,14 +374,16 @@ def remove_overlap(towerPlot, totalPlot):
             iterPlot[0] = 0 #all pre-existing coverage becomes 0
         iterPlot.iternext() #points to next element
     
-    assert bool( np.sum(layerPlot) <= np.sum(towerPlot) )
-    #check that the layer does not exceed the size of the tower coverage
-    assert bool( layerPlot.shape == totalPlot.shape)
-    #check that the dimensions haven't changed
+    if level != 'off':
+        assert bool( np.sum(layerPlot) <= np.sum(towerPlot) )
+        #check that the layer does not exceed the size of the tower
+        assert bool( layerPlot.shape == totalPlot.shape)
+        #check that the dimensions haven't changed
     return layerPlot
 
 
-def get_largest_rectangle(inPlot):
+def get_largest_rectangle(inPlot, method='sweep', checks=None, rng=None, \
+                          stats=None, useTable=False):
     '''
     Makes candidate rectangles inside of the input plot where coverage
     is indicated. Finds and returns the largest one. Note that the
@@ -219,18 +420,50 @@ def get_largest_rectangle(inPlot):
     locations. This array of the trimmed, rectangular coverage is
     finally returned as the output.
     
+    With method='histogram' the corner sweep is skipped. The exact
+    largest rectangles are found by _largest_rectangles in one pass
+    over the plot, and one of them is picked uniformly at random.
+    
+    With useTable the sweep builds a summed-area table of the plot
+    first, so each row check is four lookups instead of a scan of the
+    row span. It pays off on large, mostly free plots.
+    
     :@param inPlot: ndarray, original non-overlapping coverage
+    :@param method: str, 'sweep' (corner sweep) or 'histogram' (exact)
+    :@param checks: str, check level; None uses CHECK_LEVEL
+    :@param rng: RandomState or seed, stream for ties; see make_rng
+    :@param stats: dict, from new_tower_stats; candidates are counted
+    :@param useTable: bool, answer the sweep's row checks from a
+                      summed-area table
     :@return: ndarray, largest rectangular coverage from inPlot
     '''
     import numpy as np
     
+    level = _check_level(checks)
+    rng = make_rng(rng)
     assert isinstance(inPlot, np.ndarray), \
            "Input must be a numpy array"
-    for coord in np.nditer(inPlot): #loop thorugh each element
-        assert bool(coord == 0 or coord == 1), \
-               "Input array may only contain 0s or 1s"
-    
-    def sweep_from_corner(thePlot, r1, c1,transposed=False):
+    assert method in ('sweep', 'histogram'), \
+           "method must be 'sweep' or 'histogram'"
+    if level == 'full':
+        for coord in np.nditer(inPlot): #loop thorugh each element
+            assert bool(coord == 0 or coord == 1), \
+                   "Input array may only contain 0s or 1s"
+    elif level == 'cheap':
+        assert _is_binary(inPlot), "Input array may only contain 0s or 1s"
+    
+    if method == 'histogram':
+        outPlot = inPlot * 0
+        bestRects = _largest_rectangles(inPlot == 1, stats)
+        if len(bestRects) > 0:
+            r1, r2, c1, c2 = bestRects[ \
+                             rng.randint(0, len(bestRects)) ]
+            outPlot[r1:r2+1, c1:c2+1] = 1
+            #pick one of the equally large rectangles and plot it
+        return outPlot
+    
+    def sweep_from_corner(thePlot, r1, c1,transposed=False, \
+                          theTable=None):
         '''
         Given a starting point, generate one rectangle sweeping right
         then down and another sweeping down then right until they reach
@@ -245,12 +478,12 @@ def get_largest_rectangle(inPlot):
         elements on the same row also contain ones and thus are part of
         the coverage. Then the function sweeps down, checking its slice
         of row for zero values. The last indices are saved as the last
-        row and column.
+        row and column. With theTable, the summed-area table of
+        thePlot, each row check is four lookups instead of a scan.
         
-        A new plot is created. It is populated by zeros and ones by
-        iterating over each element and checking whether its indices
-        fall within the deteermined coverage rectangle. Coverage means
-        one and no coverage is zero.
+        A new plot of zeros is created and the determined coverage
+        rectangle is set to one with a single slice write. Coverage
+        means one and no coverage is zero.
         
         If transposed is true, the function transposes result before
         returning it as a result. Otherwise the function simply returns
@@ -260,6 +493,7 @@ def get_largest_rectangle(inPlot):
         :@param r1: int, row index to start from
         :@param c1: int, col index to start from
         :@param transposed: bool, whether the input was transposed
+        :@param theTable: ndarray, summed-area table of thePlot; optional
         :@return: ndarray, plotted largest rectangle from r1,c1
         '''
         
@@ -276,29 +510,25 @@ def get_largest_rectangle(inPlot):
         
         for j in range(r1, length):
         #loop thorugh each row
-            if 0 not in thePlot[j][c1:c2+1]:
+            if theTable is not None:
+                rowFree = rect_coverage(theTable, (j, j, c1, c2)) \
+                          == c2 - c1 + 1 #every cell in the span is a 1
+            else:
+                rowFree = 0 not in thePlot[j][c1:c2+1]
+            if rowFree:
             #check for zeros in each row; the first should never fail
                 r2 = j #save the index of last successful row
             else: #Stop when reaches a row with 0
                 break
         
         outPlot = thePlot * 0 #new plot to add the new rectangle
-        iterOut = np.nditer(outPlot, \
-                  flags=['multi_index'], op_flags=['writeonly'])
-        #iterate over each element and apply 1s in rectange range
-        while not iterOut.finished:
-            k,l = iterOut.multi_index
-            if r1 <= k <= r2 and c1 <= l <= c2:
-            #check if indices in range of r1-r2 & c1-c2
-                iterOut[0] = 1 #change to 1 if in coverage
-            else:
-                pass
-            iterOut.iternext()
+        outPlot[r1:r2+1, c1:c2+1] = 1 #1s in the rectangle range
         
-        assert outPlot.shape == thePlot.shape
-        #should generate a plot with the same shape as input
-        assert np.sum(outPlot) <= np.sum(thePlot)
-        #total coverage of output can't be more than input
+        if level == 'full': #two full sums for every candidate
+            assert outPlot.shape == thePlot.shape
+            #should generate a plot with the same shape as input
+            assert np.sum(outPlot) <= np.sum(thePlot)
+            #total coverage of output can't be more than input
         
         if transposed == True: #if input transposed before
             return np.transpose(outPlot)
@@ -307,6 +537,9 @@ def get_largest_rectangle(inPlot):
             return outPlot #return detected subset of coverage
     
     rectList = [] #store arrays representing rectangles of coverage
+    inTable = None
+    if useTable:
+        inTable = make_coverage_table(inPlot) #row checks become lookups
     
     itPlot = np.nditer(inPlot, flags=['multi_index'])
     #make an iterable for inPlot with indices available
@@ -314,17 +547,24 @@ def get_largest_rectangle(inPlot):
         if itPlot[0] == 1:
         #finds each location in coverage from input
             i,j = itPlot.multi_index
-            rectList.append( sweep_from_corner(inPlot, i, j) )
+            rectList.append( sweep_from_corner(inPlot, i, j, False, \
+                                               inTable) )
             #making largest rectangle by going right then down
             rectList.append( \
-            sweep_from_corner(np.transpose(inPlot), j, i, True) )
+            sweep_from_corner(np.transpose(inPlot), j, i, True, \
+                              None if inTable is None \
+                              else np.transpose(inTable)) )
             #biggest rectangle sweeping down the right
             #done by transposing the array at the start and end
         itPlot.iternext()
     
     #rectList should now have all the largest rectangles in coverage
+    if stats is not None:
+        stats['candidates'] += len(rectList)
     if len(rectList) == 0:
-        assert np.sum(inPlot) == 0, "No rectangle found:\n%s\n" % inPlot
+        if level != 'off':
+            assert np.sum(inPlot) == 0, \
+                   "No rectangle found:\n%s\n" % inPlot
         #Gets empty list if input is only an array of zeros
         return inPlot * 0
         #returns an array of zeros if no rectangles found
@@ -333,7 +573,8 @@ def get_largest_rectangle(inPlot):
     
     largestRect = max(rectList, key=lambda rarray: np.sum(rarray))
     #finding the largest rectangles by taking the sum of each array
-    assert bool(np.sum(largestRect) <= np.sum(inPlot))
+    if level != 'off':
+        assert bool(np.sum(largestRect) <= np.sum(inPlot))
     #largest trim shouldn't be greater than the original coverage
     
     allLargest = [largestRect]
@@ -344,132 +585,2050 @@ def get_largest_rectangle(inPlot):
             allLargest.append(bigRect) #list it if it's just as big
         else:
             pass
-    randRect = allLargest[ np.random.randint(0,len(allLargest)) ]
+    randRect = allLargest[ rng.randint(0,len(allLargest)) ]
     #pick a random rectangle from the list to limit bias
     
-    assert bool(randRect.shape == inPlot.shape), "%s" % (randRect)
-    #end result should still be the same dimensions as the start
-    assert (-1) not in (inPlot - randRect)
-    #ensures that newly trimmed coverage is within the original
+    if level != 'off':
+        assert bool(randRect.shape == inPlot.shape), "%s" % (randRect)
+        #end result should still be the same dimensions as the start
+        assert (-1) not in (inPlot - randRect)
+        #ensures that newly trimmed coverage is within the original
     return randRect
 
 
+
+def make_random_rect(L, W, rng=None):
+    '''
+    Generates the coordinates of a random rectangle representing one
+    tower's coverage in a plot of land with L rows and W columns. This
+    is the coordinate version of make_random_tower: no array is built.
+    
+    Numpy module must be available.
+    
+    The random indices are drawn exactly as in make_random_tower, two
+    columns first and then two rows, so for the same random state both
+    functions describe the same rectangle.
     
-def plot_ntowers(L, W, n=0):
+    :@param L: int, number of rows in the plot
+    :@param W: int, number of columns in the plot
+    :@param rng: RandomState or seed, random stream; see make_rng
+    :@return: tuple, (row1, row2, col1, col2), inclusive ranges
     '''
-    Tracks coverage as towers are randmly placed in a designated plot of
-    land. Can calculate the coverage from n towers or count the number
-    of towers required to fill the plot completely.
+    assert isinstance(L, int) and L > 0, \
+           "Length must be a positive integer."
+    assert isinstance(W, int) and W > 0, \
+           "Width must be a positive integer."
+    
+    rng = make_rng(rng)
+    rectW = list( rng.randint(0, W, 2) )
+    rectL = list( rng.randint(0, L, 2) )
+    #same draws, same order as make_random_tower
+    rectW.sort()
+    rectL.sort()
+    
+    return ( int(rectL[0]), int(rectL[1]), int(rectW[0]), int(rectW[1]) )
+    #Combine coords in pattern of (row1, row2, col1, col2)
+
+
+
+def remove_overlap_rect(rect, totalPlot):
+    '''
+    Coordinate version of remove_overlap. Only the window of totalPlot
+    under the tower rectangle is looked at.
     
     Numpy module must be available to function.
     
-    Dimensions are checked to be postive integers. Same for n, except it
-    may equal zero.
+    The returned boolean array has the shape of the tower, not of the
+    plot. True marks cells the tower would newly cover; False marks
+    cells that already have coverage.
     
-    It then creates an empty plot to be filled with towers. The loop
-    goes through making a tower, removing its overlap with other
-    coverages, trimming back into a rectangle, adding the coverage
-    into the main plot, and tracking the number of towers built.
+    :@param rect: tuple, (row1, row2, col1, col2) of the tower
+    :@param totalPlot: ndarray, pre-existing coverage in a plot
+    :@return: ndarray, bool, new area covered inside the tower window
+    '''
+    import numpy as np
     
-    The loop ends if the plot is completely covered or if input n is
-    non-zero and that many towers have been built.
+    assert isinstance(totalPlot, np.ndarray), \
+           "Pre-existing plot input not a numpy array"
+    assert len(rect) == 4, "Tower must be (row1, row2, col1, col2)"
+    r1, r2, c1, c2 = rect
+    assert 0 <= r1 <= r2 < totalPlot.shape[0] \
+           and 0 <= c1 <= c2 < totalPlot.shape[1], \
+           "Tower must lie inside the plot"
+    
+    return totalPlot[r1:r2+1, c1:c2+1] == 0
+    #comparison makes a new tower-sized array; the plot is untouched
+
+
+
+def _run_lengths(freeWindow):
+    '''
+    For every cell of a boolean window, count how many free cells in a
+    row start there going right, and going down. Zero for taken cells.
     
-    Asserts that the number of towers counted is a positive integer
-    value. Also checks that the proportion of the total plot covered
-    is greater than zero and less than or equal to one.
+    :@param freeWindow: ndarray, bool, True where coverage is new
+    :@return: tuple, (runRight, runDown) int arrays of the same shape
+    '''
+    import numpy as np
     
-    n is zero, then the number of towers used to fill the plot is
-    returned as the output. Otherwise, the area covered--found by
-    taking the sum of the main plot array--and the proportion of total
-    area covered is returned inside a two-element tuple.
+    length, width = freeWindow.shape
+    runRight = np.zeros((length, width + 1), dtype='int32')
+    runDown = np.zeros((length + 1, width), dtype='int32')
+    for col in range(width - 1, -1, -1): #right to left
+        runRight[:, col] = (runRight[:, col + 1] + 1) * freeWindow[:, col]
+    for row in range(length - 1, -1, -1): #bottom to top
+        runDown[row] = (runDown[row + 1] + 1) * freeWindow[row]
     
-    :@param plotLen: int, length of the plot; stored as rows in an array
-    :@param plotWidth: int, width of plot; stored as columns in an array
-    :@param n: int, towers built; if 0, will count towers to fill.
-    :@return: tuple, total area and proportion covered
+    return runRight[:, :width], runDown[:length]
+
+
+
+def _largest_rectangles(freeMask, stats=None, rowEdges=None, \
+                        colEdges=None):
+    '''
+    Finds every largest rectangle of True cells in a boolean array with
+    the histogram/stack method, in O(rows*cols).
+    
+    Row by row, each column's height is the number of free cells ending
+    in that row. A stack of (start column, height) pairs with rising
+    heights is kept. When a lower height comes, the taller entries are
+    popped and each gives the widest rectangle of its height ending in
+    this row. Every maximal rectangle shows up this way, so the largest
+    area found is exact.
+    
+    The mask may be a compressed grid whose rows and columns stand for
+    bands of cells, as from intervals_largest_rect. rowEdges and
+    colEdges then hold the first cell of each band plus the end, and
+    areas and rectangles are in cells.
+    
+    :@param freeMask: ndarray, bool, True where coverage is new
+    :@param stats: dict, from new_tower_stats; candidates are counted
+    :@param rowEdges: list, cell offsets of the mask's rows and the end;
+                      None for one cell per row
+    :@param colEdges: list, same for the columns
+    :@return: list, sorted distinct (row1, row2, col1, col2) tuples with
+              the largest area; empty if no cell is True
+    '''
+    import numpy as np
+    
+    length, width = freeMask.shape
+    if rowEdges is None:
+        rowEdges = range(length + 1)
+    if colEdges is None:
+        colEdges = range(width + 1)
+    heights = np.zeros(width, dtype='int32')
+    bestArea = 0
+    bestRects = set()
+    nPopped = 0 #each popped bar is one candidate rectangle
+    
+    for row in range(length):
+        heights = (heights + 1) * freeMask[row] #histogram for this row
+        rowHeights = heights.tolist() + [0] #a 0 flushes the stack
+        stack = []
+        for col in range(width + 1):
+            start = col
+            while stack and stack[-1][1] >= rowHeights[col]:
+                start, height = stack.pop()
+                nPopped += height > 0
+                top = rowEdges[row - height + 1]
+                area = (rowEdges[row + 1] - top) \
+                       * (colEdges[col] - colEdges[start])
+                if area > bestArea:
+                    bestArea = area
+                    bestRects = set()
+                if area == bestArea and area > 0:
+                    bestRects.add( (top, rowEdges[row + 1] - 1, \
+                                    colEdges[start], colEdges[col] - 1) )
+            stack.append( (start, rowHeights[col]) )
+    
+    if stats is not None:
+        stats['candidates'] += nPopped
+    return sorted(bestRects)
+
+
+
+def _sweep_ties(freeWindow, stats=None):
+    '''
+    The tie list get_largest_rect draws from with method='sweep'. For
+    each free cell, row by row, one rectangle sweeping right then down
+    and one sweeping down then right are made; the list is the first
+    largest of these followed by every candidate of the same area, so
+    the first largest appears twice, as in get_largest_rectangle.
+    
+    :@param freeWindow: ndarray, bool, True where coverage is new
+    :@param stats: dict, from new_tower_stats; candidates are counted
+    :@return: list, (area, row1, row2, col1, col2) tuples in window
+              coordinates; empty if no cell is True
+    '''
+    import numpy as np
+    
+    length, width = freeWindow.shape
+    runRight, runDown = _run_lengths(freeWindow)
+    
+    rectList = [] #store (area, r1, r2, c1, c2) candidate tuples
+    
+    for i, j in zip( *np.nonzero(freeWindow) ): #row-major order
+        c2 = j + runRight[i, j] - 1 #right as far as it can
+        r2 = i
+        while r2 + 1 < length and runRight[r2 + 1, j] >= c2 - j + 1:
+            r2 += 1 #then down while the whole span is free
+        rectList.append( ((r2 - i + 1) * (c2 - j + 1), i, r2, j, c2) )
+        
+        r2 = i + runDown[i, j] - 1 #down as far as it can
+        c2 = j
+        while c2 + 1 < width and runDown[i, c2 + 1] >= r2 - i + 1:
+            c2 += 1 #then right while the whole span is free
+        rectList.append( ((r2 - i + 1) * (c2 - j + 1), i, r2, j, c2) )
+    
+    if stats is not None:
+        stats['candidates'] += len(rectList)
+    if len(rectList) == 0:
+        return [] #no new coverage in this window
+    
+    largestRect = max(rectList, key=lambda cand: cand[0])
+    allLargest = [largestRect] #same tie list as get_largest_rectangle
+    for bigRect in rectList:
+        if bigRect[0] == largestRect[0]:
+            allLargest.append(bigRect)
+    return allLargest
+
+
+
+def get_largest_rect(freeWindow, rect, method='sweep', checks=None, \
+                     rng=None, stats=None):
+    '''
+    Coordinate version of get_largest_rectangle. Candidate rectangles
+    are kept as (area, row1, row2, col1, col2) tuples instead of arrays.
+    
+    Numpy module must be available to function.
+    
+    The candidates are the same as in get_largest_rectangle and come in
+    the same order: for each free cell, row by row, one rectangle
+    sweeping right then down and one sweeping down then right. Ties are
+    broken with the same single random draw, so for the same random
+    state both functions pick the same rectangle.
+    
+    The tie list comes from _sweep_ties. Sweeps use the run lengths of
+    free cells: sweeping right from a cell stops after runRight cells,
+    and each following row is kept while its own run from that column
+    is at least as long.
+    
+    method='histogram' uses _largest_rectangles instead, as in
+    get_largest_rectangle.
+    
+    :@param freeWindow: ndarray, bool, output of remove_overlap_rect
+    :@param rect: tuple, (row1, row2, col1, col2) of the tower window
+    :@param method: str, 'sweep' (corner sweep) or 'histogram' (exact)
+    :@param checks: str, check level; None uses CHECK_LEVEL
+    :@param rng: RandomState or seed, stream for ties; see make_rng
+    :@param stats: dict, from new_tower_stats; candidates are counted
+    :@return: tuple, (row1, row2, col1, col2) in plot coordinates
               OR
-              int, towers built to fill plot if n=0
+              None, if the window has no free cells
     '''
     import numpy as np
     
-    assert isinstance(L, int) and L > 0, \
-           "Length must be a positive integer."
-    assert isinstance(W, int) and W > 0, \
-           "Width must be a positive integer."
-    assert isinstance(n, int) and n >= 0, \
-           "n must be an integer and > or = 0"
+    level = _check_level(checks)
+    rng = make_rng(rng)
+    assert isinstance(freeWindow, np.ndarray), \
+           "Window must be a numpy array"
+    assert freeWindow.shape == (rect[1] - rect[0] + 1, \
+                                rect[3] - rect[2] + 1), \
+           "Window must match the tower rectangle"
+    assert method in ('sweep', 'histogram'), \
+           "method must be 'sweep' or 'histogram'"
+    
+    if method == 'histogram':
+        bestRects = _largest_rectangles(freeWindow, stats)
+        if len(bestRects) == 0:
+            return None
+        r1, r2, c1, c2 = bestRects[ rng.randint(0, len(bestRects)) ]
+        return ( rect[0] + r1, rect[0] + r2, rect[2] + c1, rect[2] + c2 )
+    
+    if not freeWindow.any():
+        return None #no new coverage; skip the sweep
+    
+    allLargest = _sweep_ties(freeWindow, stats)
+    randRect = allLargest[ rng.randint(0,len(allLargest)) ]
+    
+    area, r1, r2, c1, c2 = randRect
+    if level != 'off':
+        assert freeWindow[r1:r2+1, c1:c2+1].all(), \
+               "Trimmed tower must lie inside the new coverage"
+    return ( int(rect[0] + r1), int(rect[0] + r2), \
+             int(rect[2] + c1), int(rect[2] + c2) )
+    #shift window indices back into plot coordinates
+
+
+def make_tower_index(L, W, cellSize=None):
+    '''
+    Makes an empty spatial index for the trimmed towers placed in a
+    plot of land. The plot is split into square buckets of cellSize
+    cells; each bucket lists the towers that reach into it, so a query
+    only looks at towers near the rectangle asked about.
+    
+    The index is a plain dict: 'shape', the plot's (L, W), 'cellSize',
+    'buckets' mapping (bucket row, bucket col) to a list of tower ids,
+    and 'rects', the placed (row1, row2, col1, col2) tuples in order.
+    
+    :@param L: int, number of rows in the plot
+    :@param W: int, number of columns in the plot
+    :@param cellSize: int, bucket side in cells; None picks one giving
+                      about 4096 buckets
+    :@return: dict, empty tower index
+    '''
+    import math
     
-    mainPlot = plot_land(L,W) #generate the empty plot
-    totalArea = L * W
+    for dimension in [W, L]:
+        assert isinstance(dimension, int) and bool(dimension > 0), \
+               "Plot dimensions must be positive integers."
+    if cellSize is None:
+        cellSize = max(1, int( math.sqrt(L * W / 4096.0) ))
+    assert isinstance(cellSize, int) and cellSize > 0, \
+           "cellSize must be a positive integer."
     
-    nBuilt = 0 #tracks number of towers built; says when to exit loop
-    finished = 0 
-    while finished == 0: #may be changed by different events to end loop
-        randTower = make_random_tower(mainPlot)
-        #generate a tower with random rectangular coverage
-        overlapFree = remove_overlap(randTower, mainPlot)
-        #remove parts of coverage already in the main plot
-        trimTower = get_largest_rectangle(overlapFree)
-        #find the largest rectangle in the remaining region
-        mainPlot += trimTower
-        #add the new coverage to the rest of the coverage
-        nBuilt += 1 #counting towers
-        if nBuilt == n and n != 0 \
-           or np.sum(mainPlot) == totalArea:
-        #checking whether its reached n-towers or filled the whole plot
-            finished += 1
-        else:
-            pass
+    return {'shape': (L, W), 'cellSize': cellSize, 'buckets': {}, \
+            'rects': []}
+
+
+
+def _index_buckets(index, rect):
+    '''
+    Keys of every bucket a rectangle reaches into.
     
-    assert isinstance(nBuilt, int) and nBuilt > 0
-    #The number of towers must be an integer 1 or greater
-    ratioCovered = np.sum(mainPlot) / float(totalArea)
-    assert 0 < ratioCovered <= 1
-    #The proportion of the area covered is between 0 and 1
+    :@param index: dict, output of make_tower_index
+    :@param rect: tuple, (row1, row2, col1, col2), inclusive ranges
+    :@return: list, (bucket row, bucket col) keys
+    '''
+    size = index['cellSize']
+    r1, r2, c1, c2 = rect
+    return [ (i, j) for i in range(r1 // size, r2 // size + 1) \
+                    for j in range(c1 // size, c2 // size + 1) ]
+
+
+
+def index_add(index, rect):
+    '''
+    Adds a placed tower to the index, in place.
+    
+    :@param index: dict, output of make_tower_index
+    :@param rect: tuple, (row1, row2, col1, col2) of the tower
+    '''
+    towerId = len(index['rects'])
+    index['rects'].append( tuple(rect) )
+    for key in _index_buckets(index, rect):
+        index['buckets'].setdefault(key, []).append(towerId)
+
+
+
+def index_query(index, rect):
+    '''
+    Finds the placed towers that overlap a rectangle, looking only in
+    the buckets the rectangle reaches into.
     
+    :@param index: dict, output of make_tower_index
+    :@param rect: tuple, (row1, row2, col1, col2), inclusive ranges
+    :@return: list, (row1, row2, col1, col2) of overlapping towers
+    '''
+    r1, r2, c1, c2 = rect
+    found = set()
+    for key in _index_buckets(index, rect):
+        found.update( index['buckets'].get(key, ()) )
+    
+    hits = []
+    for towerId in sorted(found):
+        t1, t2, u1, u2 = index['rects'][towerId]
+        if t1 <= r2 and r1 <= t2 and u1 <= c2 and c1 <= u2:
+            hits.append( index['rects'][towerId] )
+    return hits
+
+
+
+def index_rect_coverage(index, rect):
+    '''
+    Number of covered cells inside a rectangle. Placed towers never
+    overlap, so this is the sum of their overlaps with the rectangle.
     
-    if n == 0: #no number of towers given
-        return nBuilt #return n towers built
-    else:
-        return ( np.sum(mainPlot), round(ratioCovered, 3) )
-        #return tuple, number of 1s in the plot and
-        #the proportion of the area they cover (decimal).
+    :@param index: dict, output of make_tower_index
+    :@param rect: tuple, (row1, row2, col1, col2), inclusive ranges
+    :@return: int, covered cells in the rectangle
+    '''
+    r1, r2, c1, c2 = rect
+    covered = 0
+    for t1, t2, u1, u2 in index_query(index, rect):
+        covered += (min(r2, t2) - max(r1, t1) + 1) \
+                   * (min(c2, u2) - max(c1, u1) + 1)
+    return covered
 
 
 
-def sample_towersToFill(L, W, n=100):
+def index_window(index, rect):
     '''
-    To estimate the number of towers needed to fill a plot of land, this
-    function simulates the process of filling a plot up for n
-    repetitions.
+    Coverage inside a rectangle, rebuilt from the overlapping towers
+    only. Same layout as bits_window.
     
-    Asserts that all inputs are positive integers, then runs a loop for
-    n iterations collecting the number of towers used each time a plot
-    is filled. These results are stored as a list of integers.
+    :@param index: dict, output of make_tower_index
+    :@param rect: tuple, (row1, row2, col1, col2), inclusive ranges
+    :@return: ndarray, bool, coverage inside the rectangle
+    '''
+    import numpy as np
     
-    Before returning the results in a list, the list is checked for
-    appropriate length n and content (integers only).
+    r1, r2, c1, c2 = rect
+    window = np.zeros((r2 - r1 + 1, c2 - c1 + 1), dtype='bool')
+    for t1, t2, u1, u2 in index_query(index, rect):
+        window[max(r1, t1) - r1 : min(r2, t2) - r1 + 1, \
+               max(c1, u1) - c1 : min(c2, u2) - c1 + 1] = True
+    return window
+
+
+
+def make_interval_plot(L, W):
+    '''
+    Makes an empty run-length coverage plot: each row is a sorted list
+    of the covered intervals in it, so memory and the cost of a tower
+    grow with the number of interval ends rather than with the width.
     
-    :@param L: int, length dimension of the plot
-    :@param W: int, width dimension of the plot
-    :@return: dict, results with the number of times they occurred
+    The plot is a plain dict: 'shape', the plot's (L, W), and 'rows',
+    one flat list per row of alternating starts and ends, [s0, e0, s1,
+    e1, ...], where interval k covers columns sk to ek-1.
+    
+    :@param L: int, number of rows in the plot
+    :@param W: int, number of columns in the plot
+    :@return: dict, empty interval plot
+    '''
+    for dimension in [W, L]:
+        assert isinstance(dimension, int) and bool(dimension > 0), \
+               "Plot dimensions must be positive integers."
+    return {'shape': (L, W), 'rows': [ [] for row in range(L) ]}
+
+
+
+def intervals_add(intervalPlot, rect):
     '''
+    Marks every cell of a rectangle as covered in an interval plot, in
+    place. Each row's intervals touching the rectangle are merged with
+    it by one bisection per end.
     
-    for funVars in [L, W, n]:
-        assert isinstance(funVars, int) and bool(funVars > 0), \
-            "%s must be a positive integer." % (funVars)
-        #All inputs must be positve integers
+    :@param intervalPlot: dict, from make_interval_plot
+    :@param rect: tuple, (row1, row2, col1, col2), inclusive ranges
+    '''
+    import bisect
+    
+    r1, r2, c1, c2 = rect
+    rows = intervalPlot['rows']
+    for row in range(r1, r2 + 1):
+        ends = rows[row]
+        lo = bisect.bisect_left(ends, c1)
+        hi = bisect.bisect_right(ends, c2 + 1)
+        #an even position is outside every interval, odd is inside
+        ends[lo:hi] = [c1] * (lo % 2 == 0) + [c2 + 1] * (hi % 2 == 0)
+
+
+
+def intervals_free(intervalPlot, rect):
+    '''
+    Uncovered intervals of each row of a rectangle.
     
-    resultList = [] #List of tower counts from filling the plot
-    for i in range(n):
-        resultList.append( plot_ntowers(L, W, 0) )
-        #append the result of filling the plot
+    :@param intervalPlot: dict, from make_interval_plot
+    :@param rect: tuple, (row1, row2, col1, col2), inclusive ranges
+    :@return: list, per row of the rectangle, a list of (start, end)
+              free intervals clipped to it, covering start to end-1
+    '''
+    import bisect
+    
+    r1, r2, c1, c2 = rect
+    rows = intervalPlot['rows']
+    freeRows = []
+    for row in range(r1, r2 + 1):
+        ends = rows[row]
+        lo = bisect.bisect_right(ends, c1)
+        hi = bisect.bisect_left(ends, c2 + 1)
+        cuts = [c1] * (lo % 2 == 0) + ends[lo:hi] + [c2 + 1] * (hi % 2 == 0)
+        #free runs start at even positions of cuts
+        freeRows.append( [ (cuts[k], cuts[k + 1]) \
+                           for k in range(0, len(cuts), 2) \
+                           if cuts[k] < cuts[k + 1] ] )
+    return freeRows
+
+
+
+def intervals_rect_coverage(intervalPlot, rect):
+    '''
+    Number of covered cells inside a rectangle of an interval plot.
     
-    assert len(resultList) == n
-    #check that the right number of iterations was made
-    for result in resultList:
-        assert isinstance(result, int) and result > 0
-        #number of towers should be postive integer
+    :@param intervalPlot: dict, from make_interval_plot
+    :@param rect: tuple, (row1, row2, col1, col2), inclusive ranges
+    :@return: int, covered cells in the rectangle
+    '''
+    r1, r2, c1, c2 = rect
+    free = sum( end - start for freeRow in intervals_free(intervalPlot, rect) \
+                for start, end in freeRow )
+    return (r2 - r1 + 1) * (c2 - c1 + 1) - free
+
+
+
+def intervals_window(intervalPlot, rect):
+    '''
+    Coverage inside a rectangle of an interval plot. Same layout as
+    bits_window.
     
+    :@param intervalPlot: dict, from make_interval_plot
+    :@param rect: tuple, (row1, row2, col1, col2), inclusive ranges
+    :@return: ndarray, bool, coverage inside the rectangle
+    '''
+    import numpy as np
+    
+    r1, r2, c1, c2 = rect
+    window = np.ones((r2 - r1 + 1, c2 - c1 + 1), dtype='bool')
+    for i, freeRow in enumerate( intervals_free(intervalPlot, rect) ):
+        for start, end in freeRow:
+            window[i, start - c1 : end - c1] = False
+    return window
+
+
+
+def intervals_largest_rect(freeRows, rect, rng=None, stats=None):
+    '''
+    get_largest_rect with method='histogram', on the free intervals of
+    a tower's rows instead of a window of cells.
+    
+    Neighbouring rows with the same free intervals are merged into one
+    band, and the columns are cut into bands at every interval end, so
+    every cell of a band of rows and a band of columns is equally free.
+    A largest rectangle can't stop partway through a band, since it
+    could then grow, so _largest_rectangles on the grid of bands, with
+    band sizes as weights, finds the same sorted rectangles as on the
+    cells. The same random draw then picks the same one. The work
+    depends on the number of interval ends, not on the tower's width.
+    
+    :@param freeRows: list, from intervals_free for the tower
+    :@param rect: tuple, (row1, row2, col1, col2) of the tower
+    :@param rng: RandomState or seed, stream for ties; see make_rng
+    :@param stats: dict, from new_tower_stats; candidates are counted
+    :@return: tuple, (row1, row2, col1, col2) in plot coordinates
+              OR
+              None, if the tower has no free cells
+    '''
+    import numpy as np
+    
+    rng = make_rng(rng)
+    r1, r2, c1, c2 = rect
+    
+    bandRows = [] #free intervals of each band of rows
+    rowEdges = []
+    for i, freeRow in enumerate(freeRows):
+        if i == 0 or freeRow != bandRows[-1]:
+            bandRows.append(freeRow)
+            rowEdges.append(i)
+    rowEdges.append( len(freeRows) )
+    
+    cuts = set([c1, c2 + 1])
+    for freeRow in bandRows:
+        for start, end in freeRow:
+            cuts.update( (start, end) )
+    colEdges = sorted(cuts)
+    band = dict( (edge, k) for k, edge in enumerate(colEdges) )
+    
+    bandMask = np.zeros((len(bandRows), len(colEdges) - 1), dtype='bool')
+    for i, freeRow in enumerate(bandRows):
+        for start, end in freeRow:
+            bandMask[i, band[start] : band[end]] = True
+    
+    bestRects = _largest_rectangles(bandMask, stats, rowEdges, \
+                                    [ edge - c1 for edge in colEdges ])
+    if len(bestRects) == 0:
+        return None
+    t1, t2, u1, u2 = bestRects[ rng.randint(0, len(bestRects)) ]
+    return (r1 + t1, r1 + t2, c1 + u1, c1 + u2)
+
+
+
+def _coverage_window(mainPlot, rect, coverage):
+    '''
+    Overlap-free part of a tower for any coverage backend of
+    plot_ntowers.
+    
+    :@param mainPlot: ndarray or dict, main plot or tower index
+    :@param rect: tuple, (row1, row2, col1, col2) of the tower
+    :@param coverage: str, coverage backend of mainPlot
+    :@return: ndarray, bool, True where the tower adds coverage
+    '''
+    if coverage == 'bits':
+        return ~bits_window(mainPlot, rect)
+    elif coverage == 'index':
+        return ~index_window(mainPlot, rect)
+    elif coverage == 'intervals':
+        return ~intervals_window(mainPlot, rect)
+    else:
+        return remove_overlap_rect(rect, mainPlot)
+
+
+
+def _cover_rect(mainPlot, rect, coverage):
+    '''
+    Marks a trimmed tower as covered, in place, for any coverage backend
+    of plot_ntowers.
+    
+    :@param mainPlot: ndarray or dict, main plot or tower index
+    :@param rect: tuple, (row1, row2, col1, col2) of new coverage
+    :@param coverage: str, coverage backend of mainPlot
+    '''
+    if coverage == 'bits':
+        bits_set_rect(mainPlot, rect)
+    elif coverage == 'index':
+        index_add(mainPlot, rect)
+    elif coverage == 'intervals':
+        intervals_add(mainPlot, rect)
+    else:
+        r1, r2, c1, c2 = rect
+        mainPlot[r1:r2+1, c1:c2+1] = 1
+
+
+
+def _count_covered(mainPlot, coverage):
+    '''
+    Counts every covered cell, for any coverage backend of plot_ntowers.
+    Used for checks only; plot_ntowers keeps a running count.
+    
+    :@param mainPlot: ndarray or dict, main plot or tower index
+    :@param coverage: str, coverage backend of mainPlot
+    :@return: int, number of covered cells
+    '''
+    import numpy as np
+    
+    if coverage == 'bits':
+        return bits_count(mainPlot)
+    elif coverage == 'index':
+        return sum( (r2 - r1 + 1) * (c2 - c1 + 1) \
+                    for r1, r2, c1, c2 in mainPlot['rects'] )
+    elif coverage == 'intervals':
+        return sum( sum(ends[1::2]) - sum(ends[0::2]) \
+                    for ends in mainPlot['rows'] )
+    else:
+        return int( np.count_nonzero(mainPlot) )
+
+
+
+def make_coverage_table(plotArray):
+    '''
+    Builds the summed-area table (integral image) of a coverage plot.
+    Entry [i, j] holds the number of covered cells in rows 0 to i-1 and
+    columns 0 to j-1, so the table has one extra row and column.
+    
+    Numpy module must be available to function.
+    
+    :@param plotArray: ndarray, coverage plot; nonzero means covered
+    :@return: ndarray, int64, (L+1) x (W+1) summed-area table
+    '''
+    import numpy as np
+    
+    assert isinstance(plotArray, np.ndarray) and plotArray.ndim == 2, \
+           "Input must be a two-dimensional numpy array."
+    
+    L, W = plotArray.shape
+    table = np.zeros((L + 1, W + 1), dtype='int64')
+    table[1:, 1:] = (plotArray != 0).cumsum(axis=0).cumsum(axis=1)
+    return table
+
+
+
+def rect_coverage(table, rect):
+    '''
+    Number of covered cells inside a rectangle, from four lookups in a
+    summed-area table.
+    
+    :@param table: ndarray, output of make_coverage_table
+    :@param rect: tuple, (row1, row2, col1, col2), inclusive ranges
+    :@return: int, covered cells in the rectangle
+    '''
+    r1, r2, c1, c2 = rect
+    return int( table[r2+1, c2+1] - table[r1, c2+1] \
+                - table[r2+1, c1] + table[r1, c1] )
+
+
+
+def add_rect_to_table(table, rect):
+    '''
+    Updates a summed-area table in place after a rectangle of new,
+    previously uncovered cells was added to the plot. Only entries
+    below and right of the rectangle's corner change; each gets the
+    size of its overlap with the rectangle, in one array operation.
+    
+    :@param table: ndarray, output of make_coverage_table
+    :@param rect: tuple, (row1, row2, col1, col2) of new coverage
+    '''
+    import numpy as np
+    
+    r1, r2, c1, c2 = rect
+    rows = np.minimum( np.arange(r1 + 1, table.shape[0]), r2 + 1 ) - r1
+    cols = np.minimum( np.arange(c1 + 1, table.shape[1]), c2 + 1 ) - c1
+    table[r1+1:, c1+1:] += np.outer(rows, cols)
+    #overlap of the rectangle with rows 0..i-1 and cols 0..j-1
+
+
+def _skip_covered_rects(table, rng=None, limit=None, batch=8, \
+                        keepWasted=False):
+    '''
+    Draws towers as make_random_rect would until one adds coverage,
+    checking a batch of towers at once against a summed-area table.
+    
+    The towers are independent, so the number drawn before the first
+    useful one follows the same geometric law as drawing them one by
+    one through the whole pipeline, and the useful one has the same
+    distribution as in that process. Only the order of the random
+    draws differs. The batch doubles each time it holds no useful
+    tower, so a nearly full plot takes a few array operations instead
+    of thousands of loop passes. The wasted towers are only kept if
+    asked for, such as for a trace; otherwise only their count is.
+    
+    :@param table: ndarray, summed-area table of the main plot
+    :@param rng: RandomState or seed, random stream; see make_rng
+    :@param limit: int, most towers to draw; None for no limit
+    :@param batch: int, towers in the first batch
+    :@param keepWasted: bool, also return the wasted towers
+    :@return: tuple, (number of wasted towers, ndarray of them as rows
+              of (row1, row2, col1, col2) or None without keepWasted,
+              the useful tower or None if limit was reached first)
+    '''
+    import numpy as np
+    
+    rng = make_rng(rng)
+    L, W = table.shape[0] - 1, table.shape[1] - 1
+    
+    wasted = [] if keepWasted else None
+    drawn = 0
+    while limit is None or drawn < limit:
+        if limit is not None:
+            batch = min(batch, limit - drawn)
+        cols = np.sort( rng.randint(0, W, (batch, 2)), axis=1 )
+        rows = np.sort( rng.randint(0, L, (batch, 2)), axis=1 )
+        r1, r2, c1, c2 = rows[:, 0], rows[:, 1], cols[:, 0], cols[:, 1]
+        free = (r2 - r1 + 1) * (c2 - c1 + 1) \
+               - (table[r2+1, c2+1] - table[r1, c2+1] \
+                  - table[r2+1, c1] + table[r1, c1])
+        #uncovered cells in each tower, four lookups apiece
+        rects = np.column_stack( (r1, r2, c1, c2) )
+        
+        hits = np.flatnonzero(free)
+        if len(hits) > 0:
+            if keepWasted:
+                wasted = np.concatenate( wasted + [rects[:hits[0]]] )
+            return drawn + int(hits[0]), wasted, \
+                   tuple( int(x) for x in rects[hits[0]] )
+        if keepWasted:
+            wasted.append(rects)
+        drawn += batch
+        batch *= 2
+    if keepWasted:
+        wasted = np.concatenate(wasted)
+    return drawn, wasted, None
+
+
+
+def new_tower_stats():
+    '''
+    Makes an empty stats dict for the instrumentation of plot_ntowers
+    and sample_towersToFill. Pass it as stats=; it is filled in place
+    and adds up over every run it is passed to.
+    
+    'runs', 'towers', 'zeroArea' and 'candidates' count plot fills,
+    towers placed, towers that added no coverage and candidate
+    rectangles made while trimming. 'time' holds wall seconds spent in
+    each stage: 'generate', 'overlap', 'trim' and 'update'.
+    
+    :@return: dict, zeroed stats
+    '''
+    return {'runs': 0, 'towers': 0, 'zeroArea': 0, 'candidates': 0, \
+            'time': {'generate': 0.0, 'overlap': 0.0, 'trim': 0.0, \
+                     'update': 0.0}}
+
+
+
+def merge_tower_stats(total, part):
+    '''
+    Adds the counts and times of one stats dict into another, in place.
+    
+    :@param total: dict, stats to add to, from new_tower_stats
+    :@param part: dict, stats to add, from new_tower_stats
+    :@return: dict, total
+    '''
+    for key in ('runs', 'towers', 'zeroArea', 'candidates'):
+        total[key] += part[key]
+    for stage in total['time']:
+        total['time'][stage] += part['time'][stage]
+    return total
+
+
+
+def _lap(stats, stage, start):
+    '''
+    Books the time since start to a stage and starts the next lap.
+    
+    :@param stats: dict, from new_tower_stats
+    :@param stage: str, key of stats['time']
+    :@param start: float, time.time() at the start of the stage
+    :@return: float, time.time() now
+    '''
+    import time
+    
+    now = time.time()
+    stats['time'][stage] += now - start
+    return now
+
+
+
+def new_tower_trace(L, W, capacity=1024, path=None, dtype='int32'):
+    '''
+    Makes an empty placement trace for plot_ntowers. Pass it as trace=;
+    every tower of every run it is passed to is logged in place as one
+    row of TRACE_COLUMNS: the run, the random tower and the trimmed
+    tower as (row1, row2, col1, col2), or -1s if it added nothing.
+    
+    Rows go in a preallocated array that doubles when full. With a path
+    the array is a memory-mapped file instead, grown the same way; call
+    close_trace to cut it to the rows written. 'int16' halves the size
+    for plots up to 32767 a side and as many runs.
+    
+    :@param L: int, length dimension of the traced plots
+    :@param W: int, width dimension of the traced plots
+    :@param capacity: int, rows to allocate up front
+    :@param path: str, file to map the log to; optional
+    :@param dtype: str, 'int32' or 'int16'
+    :@return: dict, 'shape', 'data', 'size', 'runs' and 'path'
+    '''
+    import numpy as np
+    
+    assert dtype in ('int32', 'int16'), "dtype must be 'int32' or 'int16'"
+    assert max(L, W) <= np.iinfo(dtype).max, \
+           "Plot too large for a %s trace" % dtype
+    assert isinstance(capacity, int) and capacity > 0, \
+           "capacity must be a positive integer."
+    
+    shape = (capacity, len(TRACE_COLUMNS))
+    if path is None:
+        data = np.zeros(shape, dtype=dtype)
+    else:
+        data = np.memmap(path, dtype=dtype, mode='w+', shape=shape)
+    return {'shape': (L, W), 'data': data, 'size': 0, 'runs': 0, \
+            'path': path}
+
+
+
+def _trace_append(trace, raw, trim):
+    '''
+    Logs one tower to a trace, doubling its array if it is full.
+    
+    :@param trace: dict, from new_tower_trace
+    :@param raw: tuple, (row1, row2, col1, col2) of the random tower
+    :@param trim: tuple, same for the trimmed tower; None if nothing
+    '''
+    import numpy as np
+    
+    data = trace['data']
+    if trace['size'] == len(data):
+        shape = (2 * len(data), data.shape[1])
+        if trace['path'] is None:
+            grown = np.zeros(shape, dtype=data.dtype)
+            grown[:len(data)] = data
+        else:
+            data.flush()
+            del data
+            with open(trace['path'], 'r+b') as traceFile:
+                traceFile.truncate(shape[0] * shape[1] * \
+                                   trace['data'].dtype.itemsize)
+            grown = np.memmap(trace['path'], dtype=trace['data'].dtype, \
+                              mode='r+', shape=shape)
+        trace['data'] = data = grown
+    
+    assert trace['runs'] <= np.iinfo(data.dtype).max, \
+           "Too many runs for a %s trace" % data.dtype
+    if trim is None:
+        trim = (-1, -1, -1, -1)
+    data[trace['size']] = (trace['runs'],) + tuple(raw) + tuple(trim)
+    trace['size'] += 1
+
+
+
+def _array_rect(towerPlot):
+    '''
+    Bounding (row1, row2, col1, col2) of the nonzero cells of a tower
+    array, as logged in a trace.
+    
+    :@param towerPlot: ndarray, tower coverage of the array engine
+    :@return: tuple, inclusive ranges; None if the array is all zeros
+    '''
+    import numpy as np
+    
+    rows = np.flatnonzero( towerPlot.any(axis=1) )
+    cols = np.flatnonzero( towerPlot.any(axis=0) )
+    if len(rows) == 0:
+        return None
+    return (int(rows[0]), int(rows[-1]), int(cols[0]), int(cols[-1]))
+
+
+
+def close_trace(trace):
+    '''
+    Finishes a trace. A memory-mapped log is flushed and its file cut
+    to the rows written, ready for load_trace.
+    
+    :@param trace: dict, from new_tower_trace
+    :@return: ndarray, logged rows, see trace_events
+    '''
+    import numpy as np
+    
+    if trace['path'] is not None:
+        data = trace['data']
+        data.flush()
+        rowBytes = data.shape[1] * data.dtype.itemsize
+        dtype = data.dtype
+        del data
+        trace['data'] = None
+        with open(trace['path'], 'r+b') as traceFile:
+            traceFile.truncate(trace['size'] * rowBytes)
+        if trace['size'] == 0:
+            trace['data'] = np.zeros((0, len(TRACE_COLUMNS)), dtype=dtype)
+        else:
+            trace['data'] = np.memmap(trace['path'], dtype=dtype, \
+                                      mode='r+', \
+                                      shape=(trace['size'], \
+                                             len(TRACE_COLUMNS)))
+    return trace_events(trace)
+
+
+
+def trace_events(trace):
+    '''
+    Rows logged to a trace so far, one per tower in placement order.
+    
+    :@param trace: dict, from new_tower_trace
+    :@return: ndarray, view of the logged rows, see TRACE_COLUMNS
+    '''
+    return trace['data'][:trace['size']]
+
+
+
+def load_trace(path, dtype='int32'):
+    '''
+    Maps a trace file written through new_tower_trace and close_trace,
+    read only.
+    
+    :@param path: str, trace file
+    :@param dtype: str, dtype the trace was made with
+    :@return: ndarray, logged rows, see TRACE_COLUMNS
+    '''
+    import os
+    import numpy as np
+    
+    rowBytes = len(TRACE_COLUMNS) * np.dtype(dtype).itemsize
+    rows = os.path.getsize(path) // rowBytes
+    if rows == 0:
+        return np.zeros((0, len(TRACE_COLUMNS)), dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', \
+                     shape=(rows, len(TRACE_COLUMNS)))
+
+
+
+def replay_trace(events, L, W, step=None, run=0, coverage='int32'):
+    '''
+    Rebuilds the main plot of a traced run after its first step towers,
+    from the log alone; nothing is simulated again.
+    
+    :@param events: ndarray, rows from trace_events or load_trace
+    :@param L: int, length dimension of the traced plot
+    :@param W: int, width dimension of the traced plot
+    :@param step: int, towers to replay; None replays the whole run
+    :@param run: int, which run of the trace
+    :@param coverage: str, dtype of the plot, as in plot_land
+    :@return: ndarray, coverage after step towers
+    '''
+    runEvents = events[events[:, 0] == run]
+    if step is not None:
+        assert 0 <= step <= len(runEvents), \
+               "Run %d has only %d towers" % (run, len(runEvents))
+        runEvents = runEvents[:step]
+    
+    mainPlot = plot_land(L, W, coverage)
+    for event in runEvents:
+        if event[5] >= 0: #tower added coverage
+            _cover_rect(mainPlot, tuple( int(x) for x in event[5:9] ), \
+                        coverage)
+    return mainPlot
+
+
+
+
+def new_cell_stats(L, W, sizeEdges=None):
+    '''
+    Makes empty per-cell aggregates of many plot fills. Pass it as
+    cells= to sample_towersToFill, or fold traced runs into it with
+    add_cell_run. Its size doesn't grow with the number of runs.
+    
+    'firstTower' is the tower of its run that first covered a cell,
+    counting from 1, and 'towerArea' the area of the trimmed tower that
+    covered it. Each holds per-cell 'count', 'mean' and 'M2', the sum
+    of squared deviations from the mean, kept up to date with Welford's
+    method; a cell only counts in the runs that covered it.
+    'sizeCounts'[k] counts, per cell, the runs in which it was covered
+    by a trimmed tower with an area from sizeEdges[k] up to, but not
+    including, sizeEdges[k+1].
+    
+    Every per-cell array has the plot's shape, so it can go straight to
+    plotcover.plot_oneArray; see cell_stat.
+    
+    :@param L: int, length dimension of the plot
+    :@param W: int, width dimension of the plot
+    :@param sizeEdges: list, increasing tower areas bounding the size
+                       classes; None for powers of two up to L*W
+    :@return: dict, 'shape', 'runs', 'firstTower', 'towerArea',
+              'sizeEdges' and 'sizeCounts'
+    '''
+    import numpy as np
+    
+    assert isinstance(L, int) and L > 0, \
+           "Length must be a positive integer."
+    assert isinstance(W, int) and W > 0, \
+           "Width must be a positive integer."
+    if sizeEdges is None:
+        sizeEdges = [1]
+        while sizeEdges[-1] <= L * W:
+            sizeEdges.append(2 * sizeEdges[-1])
+    sizeEdges = [ int(edge) for edge in sizeEdges ]
+    assert len(sizeEdges) > 1 and \
+           all( a < b for a, b in zip(sizeEdges, sizeEdges[1:]) ), \
+           "sizeEdges must be at least two increasing areas"
+    
+    return {'shape': (L, W), 'runs': 0, \
+            'firstTower': _new_moments(L, W), \
+            'towerArea': _new_moments(L, W), \
+            'sizeEdges': sizeEdges, \
+            'sizeCounts': np.zeros((len(sizeEdges) - 1, L, W), \
+                                   dtype='int64')}
+
+
+
+def _new_moments(L, W):
+    '''
+    Zeroed per-cell count, mean and M2 arrays.
+    
+    :@param L: int, length dimension of the plot
+    :@param W: int, width dimension of the plot
+    :@return: dict, 'count', 'mean' and 'M2'
+    '''
+    import numpy as np
+    
+    return {'count': np.zeros((L, W), dtype='int64'), \
+            'mean': np.zeros((L, W)), 'M2': np.zeros((L, W))}
+
+
+
+def _add_moments(moments, values, mask):
+    '''
+    Welford update of per-cell moments with one value per cell, in
+    place. Cells outside mask are left as they are.
+    
+    :@param moments: dict, from _new_moments
+    :@param values: ndarray, one value per cell
+    :@param mask: ndarray, bool, cells the values count for
+    '''
+    import numpy as np
+    
+    moments['count'] += mask
+    delta = np.where(mask, values - moments['mean'], 0.0)
+    moments['mean'] += delta / np.maximum(moments['count'], 1)
+    moments['M2'] += delta * (values - moments['mean'])
+    #delta is 0 outside the mask, so those cells don't change
+
+
+
+def _merge_moments(total, part):
+    '''
+    Combines the per-cell moments of two sets of runs into the first,
+    in place, with Chan's pairwise formula.
+    
+    :@param total: dict, moments to add to, from _new_moments
+    :@param part: dict, moments to add, from _new_moments
+    '''
+    import numpy as np
+    
+    count = total['count'] + part['count']
+    delta = part['mean'] - total['mean']
+    share = part['count'] / np.maximum(count, 1).astype('float64')
+    #fraction of the combined runs that come from part
+    total['M2'] += part['M2'] + delta**2 * total['count'] * share
+    total['mean'] += delta * share
+    total['count'] += part['count']
+
+
+
+def add_cell_run(cells, events):
+    '''
+    Folds one traced run into per-cell aggregates, in place. Each cell
+    gets the index and area of the trimmed tower that covered it;
+    trimmed towers never overlap, so there is at most one.
+    
+    :@param cells: dict, from new_cell_stats
+    :@param events: ndarray, trace rows of a single run, such as
+                    trace_events of a fresh trace; see TRACE_COLUMNS
+    :@return: dict, cells
+    '''
+    import numpy as np
+    
+    L, W = cells['shape']
+    firstTower = np.zeros((L, W), dtype='int64')
+    towerArea = np.zeros((L, W), dtype='int64')
+    for k, event in enumerate(events):
+        if event[5] >= 0: #tower added coverage
+            r1, r2, c1, c2 = [ int(x) for x in event[5:9] ]
+            firstTower[r1:r2+1, c1:c2+1] = k + 1
+            towerArea[r1:r2+1, c1:c2+1] = (r2 - r1 + 1) * (c2 - c1 + 1)
+    covered = firstTower > 0
+    
+    _add_moments(cells['firstTower'], firstTower, covered)
+    _add_moments(cells['towerArea'], towerArea, covered)
+    sizeClass = np.searchsorted(cells['sizeEdges'], towerArea, 'right') - 1
+    for k in range(len(cells['sizeEdges']) - 1):
+        cells['sizeCounts'][k] += covered & (sizeClass == k)
+    cells['runs'] += 1
+    return cells
+
+
+
+def merge_cell_stats(total, part):
+    '''
+    Adds the per-cell aggregates of one set of runs into another, in
+    place, as if every run had been added to total. Used to combine the
+    aggregates of parallel workers.
+    
+    :@param total: dict, aggregates to add to, from new_cell_stats
+    :@param part: dict, aggregates to add, from new_cell_stats
+    :@return: dict, total
+    '''
+    assert total['shape'] == part['shape'], \
+           "Cell stats are for different plots"
+    assert total['sizeEdges'] == part['sizeEdges'], \
+           "Cell stats have different size classes"
+    
+    for field in ('firstTower', 'towerArea'):
+        _merge_moments(total[field], part[field])
+    total['sizeCounts'] += part['sizeCounts']
+    total['runs'] += part['runs']
+    return total
+
+
+
+def cell_stat(cells, field='firstTower', stat='mean'):
+    '''
+    One per-cell summary of the aggregates as a plot-shaped array, ready
+    for plotcover.plot_oneArray. Cells without enough runs for the
+    statistic, such as never covered ones, are NaN and show up blank.
+    
+    :@param cells: dict, from new_cell_stats
+    :@param field: str, 'firstTower' or 'towerArea'
+    :@param stat: str, 'mean', 'var' (sample variance), 'std' or 'count'
+    :@return: ndarray, float64, the statistic for each cell
+    '''
+    import numpy as np
+    
+    assert field in ('firstTower', 'towerArea'), \
+           "field must be 'firstTower' or 'towerArea'"
+    assert stat in ('mean', 'var', 'std', 'count'), \
+           "stat must be 'mean', 'var', 'std' or 'count'"
+    
+    moments = cells[field]
+    count = moments['count']
+    if stat == 'count':
+        return count.astype('float64')
+    if stat == 'mean':
+        return np.where(count > 0, moments['mean'], np.nan)
+    var = np.where(count > 1, moments['M2'] / np.maximum(count - 1, 1), \
+                   np.nan)
+    return var if stat == 'var' else np.sqrt(var)
+
+
+
+def plot_ntowers(L, W, n=0, engine='array', method='sweep', checks=None, \
+                 rng=None, useTable=False, coverage='int32', stats=None, \
+                 trace=None, fastForward=False):
+    '''
+    Tracks coverage as towers are randmly placed in a designated plot of
+    land. Can calculate the coverage from n towers or count the number
+    of towers required to fill the plot completely.
+    
+    Numpy module must be available to function.
+    
+    Dimensions are checked to be postive integers. Same for n, except it
+    may equal zero.
+    
+    It then creates an empty plot to be filled with towers. The loop
+    goes through making a tower, removing its overlap with other
+    coverages, trimming back into a rectangle, adding the coverage
+    into the main plot, and tracking the number of towers built.
+    
+    The loop ends if the plot is completely covered or if input n is
+    non-zero and that many towers have been built. Covered and
+    uncovered cells are counted as each trimmed tower is added, so the
+    main plot is never summed to check for this.
+    
+    With engine='array' every stage works on arrays, but only the size
+    of the window under the random tower: the tower is drawn as in
+    make_random_tower, overlap removal and trimming run on the view of
+    the main plot under it, and the trimmed tower is added back through
+    that view. Nothing plot-sized is made per tower.
+    With engine='rect' towers and candidate rectangles are kept as
+    (row1, row2, col1, col2) tuples and only the main plot is an array;
+    for the same random state both engines give the same result.
+    
+    method picks the trimming algorithm: the 'sweep' corner heuristic
+    or the exact 'histogram' largest rectangle.
+    
+    With useTable (rect engine only) a summed-area table of the main
+    plot is kept up to date as towers are added. A tower whose window
+    is already fully covered is then spotted with four lookups and
+    skips overlap removal and trimming altogether.
+    
+    fastForward (rect engine only, implies useTable) goes further and
+    skips over towers that add nothing in batches, see
+    _skip_covered_rects. The number of towers built has exactly the
+    same distribution, but a given random state gives a different run,
+    since the towers are drawn in a different order.
+    
+    coverage (rect engine only) is the dtype of the main plot, as in
+    plot_land. 'bool' and 'uint8' take a quarter of the memory of the
+    default 'int32'; 'bits' takes a thirty-second and is read and
+    written one tower window at a time. coverage='index' keeps no grid
+    at all: the placed towers go in a spatial index (make_tower_index)
+    and each new tower is checked only against the towers near it.
+    coverage='intervals' keeps each row as a list of covered intervals
+    (make_interval_plot); with method='histogram' towers are also
+    trimmed on the intervals (intervals_largest_rect), so a tower costs
+    as much as the interval ends it touches, not its width.
+    
+    Given a stats dict from new_tower_stats, the wall time of each stage
+    (generate, overlap, trim, update) and counts of towers, towers that
+    added nothing and trimming candidates are added to it. Without one
+    the only cost is a None test per stage.
+    
+    Given a trace from new_tower_trace, each tower's random and trimmed
+    rectangles are logged to it, so the run can be rebuilt step by step
+    with replay_trace.
+    
+    Asserts that the number of towers counted is a positive integer
+    value. Also checks that the proportion of the total plot covered
+    is greater than zero and less than or equal to one.
+    
+    n is zero, then the number of towers used to fill the plot is
+    returned as the output. Otherwise, the area covered--taken from the
+    running count--and the proportion of total area covered is
+    returned inside a two-element tuple.
+    
+    :@param plotLen: int, length of the plot; stored as rows in an array
+    :@param plotWidth: int, width of plot; stored as columns in an array
+    :@param n: int, towers built; if 0, will count towers to fill.
+    :@param engine: str, 'array' or 'rect' tower pipeline
+    :@param method: str, 'sweep' or 'histogram' rectangle trimming
+    :@param checks: str, check level for every stage; None uses
+                    CHECK_LEVEL
+    :@param rng: RandomState or seed, random stream for every stage;
+                 None uses the global np.random state, see make_rng
+    :@param useTable: bool, keep a summed-area table of the main plot
+    :@param coverage: str, 'int32', 'bool', 'uint8', 'bits', 'index' or
+                      'intervals'
+    :@param stats: dict, from new_tower_stats; optional instrumentation
+    :@param trace: dict, from new_tower_trace; optional placement log
+    :@param fastForward: bool, skip wasted towers in batches
+    :@return: tuple, total area and proportion covered
+              OR
+              int, towers built to fill plot if n=0
+    '''
+    import numpy as np
+    
+    assert isinstance(L, int) and L > 0, \
+           "Length must be a positive integer."
+    assert isinstance(W, int) and W > 0, \
+           "Width must be a positive integer."
+    assert isinstance(n, int) and n >= 0, \
+           "n must be an integer and > or = 0"
+    assert engine in ('array', 'rect'), \
+           "engine must be 'array' or 'rect'"
+    assert engine == 'rect' or not useTable, \
+           "useTable needs engine='rect'"
+    assert engine == 'rect' or not fastForward, \
+           "fastForward needs engine='rect'"
+    useTable = useTable or fastForward
+    assert engine == 'rect' or coverage == 'int32', \
+           "Compact coverage needs engine='rect'"
+    assert not (useTable and coverage in ('bits', 'index', 'intervals')), \
+           "A summed-area table would undo the savings of %s" % coverage
+    assert trace is None or trace['shape'] == (L, W), \
+           "Trace was made for a %dx%d plot" % trace['shape']
+    level = _check_level(checks)
+    rng = make_rng(rng) #one stream threaded through every stage
+    if stats is not None:
+        import time
+    
+    if coverage == 'index':
+        mainPlot = make_tower_index(L, W) #placed towers, no grid
+    elif coverage == 'intervals':
+        mainPlot = make_interval_plot(L, W) #covered runs of each row
+    else:
+        mainPlot = plot_land(L, W, coverage) #generate the empty plot
+    if useTable:
+        mainTable = make_coverage_table(mainPlot)
+    totalArea = L * W
+    coveredArea = 0 #running count of cells with coverage
+    uncovered = totalArea #running count of cells still without
+    
+    nBuilt = 0 #tracks number of towers built; says when to exit loop
+    finished = 0 
+    while finished == 0: #may be changed by different events to end loop
+        if stats is not None:
+            lap = time.time()
+        
+        if engine == 'rect' and fastForward:
+            limit = n - nBuilt if n != 0 else None
+            nSkipped, skipped, randRect = _skip_covered_rects( \
+                mainTable, rng, limit, keepWasted=trace is not None)
+            nBuilt += nSkipped #wasted towers still count
+            if stats is not None:
+                stats['towers'] += nSkipped
+                stats['zeroArea'] += nSkipped
+            if trace is not None:
+                for skipRect in skipped:
+                    _trace_append(trace, skipRect, None)
+            if randRect is None: #reached n on wasted towers
+                if stats is not None:
+                    lap = _lap(stats, 'generate', lap)
+                finished += 1
+                continue
+        elif engine == 'rect':
+            randRect = make_random_rect(L, W, rng)
+            #tower as (row1, row2, col1, col2); no array is made
+        else:
+            randRect = make_random_rect(L, W, rng)
+            #same draws as make_random_tower, without the plot array
+            r1, r2, c1, c2 = randRect
+            mainWindow = mainPlot[r1:r2+1, c1:c2+1] #view into mainPlot
+            randTower = np.ones(mainWindow.shape, dtype=mainPlot.dtype)
+            #the tower's coverage, as an array the size of its window
+        if stats is not None:
+            lap = _lap(stats, 'generate', lap)
+        
+        if engine == 'rect':
+            r1, r2, c1, c2 = randRect
+            towerArea = (r2 - r1 + 1) * (c2 - c1 + 1)
+            if useTable and rect_coverage(mainTable, randRect) \
+               == towerArea or coverage == 'index' \
+               and index_rect_coverage(mainPlot, randRect) == towerArea:
+                freeWindow = None #window already covered; nothing to add
+            elif coverage == 'intervals' and method == 'histogram':
+                freeWindow = intervals_free(mainPlot, randRect)
+                #free runs of each row; no cells are made
+            else:
+                freeWindow = _coverage_window(mainPlot, randRect, coverage)
+                #new coverage, only inside the tower's window
+        else:
+            overlapFree = remove_overlap(randTower, mainWindow, level)
+            #remove parts of coverage already in the main plot, only
+            #looking at the tower's window
+        if stats is not None:
+            lap = _lap(stats, 'overlap', lap)
+        
+        if engine == 'rect':
+            trimRect = None
+            if coverage == 'intervals' and method == 'histogram':
+                trimRect = intervals_largest_rect(freeWindow, randRect, \
+                                                  rng, stats)
+            elif freeWindow is not None:
+                trimRect = get_largest_rect(freeWindow, randRect, method, \
+                                            level, rng, stats)
+        else:
+            trimWindow = get_largest_rectangle(overlapFree, method, level, \
+                                               rng, stats)
+            #find the largest rectangle in the remaining region
+        if stats is not None:
+            lap = _lap(stats, 'trim', lap)
+        
+        if engine == 'rect':
+            if trimRect is not None:
+                r1, r2, c1, c2 = trimRect
+                _cover_rect(mainPlot, trimRect, coverage)
+                #add the new coverage straight into the main plot
+                if useTable:
+                    add_rect_to_table(mainTable, trimRect)
+                newArea = (r2 - r1 + 1) * (c2 - c1 + 1)
+            else:
+                newArea = 0
+        else:
+            mainWindow += trimWindow
+            #add the new coverage to the rest of the coverage, in place
+            newArea = int( np.count_nonzero(trimWindow) )
+        if stats is not None:
+            lap = _lap(stats, 'update', lap)
+            stats['towers'] += 1
+            stats['zeroArea'] += newArea == 0
+        if trace is not None:
+            if engine == 'rect':
+                _trace_append(trace, randRect, trimRect)
+            else:
+                trimRect = _array_rect(trimWindow)
+                if trimRect is not None: #window back to plot coordinates
+                    trimRect = (r1 + trimRect[0], r1 + trimRect[1], \
+                                c1 + trimRect[2], c1 + trimRect[3])
+                _trace_append(trace, randRect, trimRect)
+        
+        coveredArea += newArea
+        uncovered -= newArea
+        nBuilt += 1 #counting towers
+        if nBuilt == n and n != 0 \
+           or uncovered == 0:
+        #checking whether its reached n-towers or filled the whole plot
+            finished += 1
+        else:
+            pass
+    
+    assert isinstance(nBuilt, int) and nBuilt > 0
+    #The number of towers must be an integer 1 or greater
+    if stats is not None:
+        stats['runs'] += 1
+    if trace is not None:
+        trace['runs'] += 1
+    if level != 'off':
+        assert coveredArea == _count_covered(mainPlot, coverage), \
+               "Running count must match the main plot"
+    ratioCovered = coveredArea / float(totalArea)
+    assert 0 < ratioCovered <= 1
+    #The proportion of the area covered is between 0 and 1
+    
+    
+    if n == 0: #no number of towers given
+        return nBuilt #return n towers built
+    else:
+        return ( coveredArea, round(ratioCovered, 3) )
+        #return tuple, number of 1s in the plot and
+        #the proportion of the area they cover (decimal).
+
+
+
+def _sample_rng(seed, i):
+    '''
+    Random stream for sample i of a seeded run of sample_towersToFill.
+    Each sample gets its own stream, seeded from the pair (seed, i), so
+    the result of a sample does not depend on which process ran it.
+    
+    :@param seed: int, master seed of the run
+    :@param i: int, index of the sample
+    :@return: RandomState, independent stream for that sample
+    '''
+    import numpy as np
+    
+    return np.random.RandomState([seed, i])
+
+
+
+def _sample_block(args):
+    '''
+    Fills the plot for samples start to stop-1 of a seeded run. Top
+    level so that multiprocessing can send it to worker processes.
+    
+    :@param args: tuple, (L, W, seed, start, stop, engine, method,
+                  checks), optionally followed by a stats dict and a
+                  cells dict
+    :@return: list, towers used to fill the plot for each sample
+    '''
+    L, W, seed, start, stop, engine, method, checks = args[:8]
+    stats = args[8] if len(args) > 8 else None
+    cells = args[9] if len(args) > 9 else None
+    return [ _fill_plot(L, W, engine, method, checks, \
+                        _sample_rng(seed, i), stats, cells) \
+             for i in range(start, stop) ]
+
+
+
+def _sample_block_stats(args):
+    '''
+    _sample_block for a worker process that also has to send back the
+    stats and cell aggregates of its block, since the caller's dicts
+    can't be shared.
+    
+    :@param args: tuple, as for _sample_block without stats or cells,
+                  followed by whether to keep stats and the sizeEdges
+                  of the cell aggregates, None to keep none
+    :@return: tuple, (list of results, stats dict of the block or None,
+              cells dict of the block or None)
+    '''
+    withStats, sizeEdges = args[8:]
+    stats = new_tower_stats() if withStats else None
+    cells = None if sizeEdges is None \
+            else new_cell_stats(args[0], args[1], sizeEdges)
+    return _sample_block( tuple(args[:8]) + (stats, cells) ), stats, cells
+
+
+
+def _fill_plot(L, W, engine, method, checks, rng=None, stats=None, \
+               cells=None):
+    '''
+    Fills the plot once for sample_towersToFill. With cells the run is
+    traced and folded into the per-cell aggregates as soon as it ends.
+    
+    :@param cells: dict, from new_cell_stats; optional
+    :@return: int, towers used to fill the plot
+    '''
+    if cells is None:
+        return plot_ntowers(L, W, 0, engine, method, checks, rng, \
+                            stats=stats)
+    trace = new_tower_trace(L, W, capacity=64)
+    result = plot_ntowers(L, W, 0, engine, method, checks, rng, \
+                          stats=stats, trace=trace)
+    add_cell_run(cells, trace_events(trace))
+    return result
+
+
+
+def sample_towersToFill(L, W, n=100, engine='array', method='sweep', \
+                        checks=None, seed=None, workers=1, stats=None, \
+                        start=0, cells=None):
+    '''
+    To estimate the number of towers needed to fill a plot of land, this
+    function simulates the process of filling a plot up for n
+    repetitions.
+    
+    Asserts that all inputs are positive integers, then runs a loop for
+    n iterations collecting the number of towers used each time a plot
+    is filled. These results are stored as a list of integers.
+    
+    If a seed is given, sample i draws from its own random stream made
+    from (seed, i) instead of the global np.random state. With workers
+    above one the samples are split into blocks and run in a pool of
+    worker processes. Because each sample has its own stream, a given
+    seed and n give the same list for any number of workers, including
+    a serial run. With workers above one and no seed, a seed is drawn
+    from the global state. start skips the first samples of a seeded
+    run, so more samples can be added to an earlier list later.
+    
+    Given a cells dict from new_cell_stats, each run is added to its
+    per-cell aggregates as it finishes. Workers keep aggregates of their
+    own blocks, which are merged into cells at the end.
+    
+    Before returning the results in a list, the list is checked for
+    appropriate length n and content (integers only).
+    
+    :@param L: int, length dimension of the plot
+    :@param W: int, width dimension of the plot
+    :@param engine: str, tower pipeline passed on to plot_ntowers
+    :@param method: str, rectangle trimming passed on to plot_ntowers
+    :@param checks: str, check level passed on to plot_ntowers
+    :@param seed: int or RandomState, master seed for per-sample
+                 streams; optional, see _master_seed
+    :@param workers: int, number of worker processes
+    :@param stats: dict, from new_tower_stats; instrumentation summed
+                   over every sample, from all workers
+    :@param start: int, index of the first sample; needs a seed
+    :@param cells: dict, from new_cell_stats; per-cell aggregates over
+                   every sample, from all workers
+    :@return: dict, results with the number of times they occurred
+    '''
+    
+    import numpy as np
+    
+    for funVars in [L, W, n, workers]:
+        assert isinstance(funVars, int) and bool(funVars > 0), \
+            "%s must be a positive integer." % (funVars)
+        #All inputs must be positve integers
+    assert isinstance(start, int) and start >= 0, \
+           "start must be an integer and > or = 0"
+    seed = _master_seed(seed)
+    assert seed is not None or start == 0, "start needs a seed"
+    assert cells is None or cells['shape'] == (L, W), \
+           "Cell stats were made for a %dx%d plot" % cells['shape']
+    
+    if seed is None and workers > 1:
+        seed = int( np.random.randint(0, 2**31 - 1) )
+        #workers can't share the global state; give them a seed
+    
+    resultList = [] #List of tower counts from filling the plot
+    if seed is None:
+        for i in range(n):
+            resultList.append( \
+                _fill_plot(L, W, engine, method, checks, None, stats, \
+                           cells) )
+            #append the result of filling the plot
+    elif workers == 1:
+        resultList = _sample_block( \
+                     (L, W, seed, start, start + n, engine, method, \
+                      checks, stats, cells) )
+    else:
+        import multiprocessing
+        
+        nBlocks = min(n, workers * 4) #a few blocks each to share load
+        bounds = [ start + (n * k) // nBlocks for k in range(nBlocks + 1) ]
+        blocks = [ (L, W, seed, bounds[k], bounds[k + 1], \
+                    engine, method, checks) for k in range(nBlocks) ]
+        pool = multiprocessing.Pool(workers)
+        try:
+            if stats is None and cells is None:
+                for block in pool.map(_sample_block, blocks): #keeps order
+                    resultList.extend(block)
+            else:
+                sizeEdges = None if cells is None else cells['sizeEdges']
+                blocks = [ block + (stats is not None, sizeEdges) \
+                           for block in blocks ]
+                for block, blockStats, blockCells \
+                    in pool.map(_sample_block_stats, blocks):
+                    resultList.extend(block)
+                    if stats is not None:
+                        merge_tower_stats(stats, blockStats)
+                    if cells is not None:
+                        merge_cell_stats(cells, blockCells)
+        finally:
+            pool.close()
+            pool.join()
+    
+    assert len(resultList) == n
+    #check that the right number of iterations was made
+    for result in resultList:
+        assert isinstance(result, int) and result > 0
+        #number of towers should be postive integer
+    
+    return resultList
+        
+
+
+def coverage_curve(L, W, n=0, engine='array', method='sweep', checks=None, \
+                   rng=None, coverage='int32'):
+    '''
+    Covered area after each tower of one run of plot_ntowers, so the
+    coverage for every tower count up to n comes from a single fill.
+    Entry k is what plot_ntowers(L, W, k + 1) returns as covered area
+    for the same random state. The run is traced and the areas of the
+    trimmed towers are summed from the log.
+    
+    :@param L: int, length dimension of the plot
+    :@param W: int, width dimension of the plot
+    :@param n: int, towers to place; if 0, places towers until full
+    :@param engine: str, tower pipeline passed on to plot_ntowers
+    :@param method: str, rectangle trimming passed on to plot_ntowers
+    :@param checks: str, check level passed on to plot_ntowers
+    :@param rng: RandomState or seed, random stream; see make_rng
+    :@param coverage: str, coverage backend passed on to plot_ntowers
+    :@return: ndarray, int64, covered area after each tower; shorter
+              than n if the plot filled up first
+    '''
+    import numpy as np
+    
+    trace = new_tower_trace(L, W, capacity=max(n, 64))
+    plot_ntowers(L, W, n, engine, method, checks, rng, \
+                 coverage=coverage, trace=trace)
+    events = trace_events(trace)
+    
+    added = (events[:, 6] - events[:, 5] + 1).astype('int64') \
+            * (events[:, 8] - events[:, 7] + 1)
+    added[events[:, 5] < 0] = 0 #towers that added nothing
+    return np.cumsum(added)
+
+
+
+def sample_coverage_curves(L, W, n=0, samples=100, engine='array', \
+                           method='sweep', checks=None, seed=None, \
+                           quantiles=(0.1, 0.5, 0.9)):
+    '''
+    Runs coverage_curve for many samples and summarizes them per tower
+    count. Runs that fill the plot early stay at full coverage for the
+    rest of the curve; with n=0 every curve runs to the longest fill.
+    
+    With a seed, sample i uses the same stream as in
+    sample_towersToFill, so curve lengths match its results.
+    
+    :@param L: int, length dimension of the plot
+    :@param W: int, width dimension of the plot
+    :@param n: int, towers per curve; if 0, until each plot is full
+    :@param samples: int, number of runs
+    :@param engine: str, tower pipeline passed on to plot_ntowers
+    :@param method: str, rectangle trimming passed on to plot_ntowers
+    :@param checks: str, check level passed on to plot_ntowers
+    :@param seed: int or RandomState, master seed for per-sample
+                 streams; optional, see _master_seed
+    :@param quantiles: list, probabilities for the quantile curves
+    :@return: dict, 'towers' (1 to the curve length), 'mean' covered
+              area and 'quantiles', one row per probability
+    '''
+    import numpy as np
+    
+    assert isinstance(samples, int) and samples > 0, \
+           "samples must be a positive integer."
+    seed = _master_seed(seed)
+    
+    curves = []
+    for i in range(samples):
+        rng = None if seed is None else _sample_rng(seed, i)
+        curves.append( coverage_curve(L, W, n, engine, method, checks, \
+                                      rng) )
+    
+    length = n if n > 0 else max( len(curve) for curve in curves )
+    allCurves = np.full( (samples, length), L * W, dtype='int64' )
+    #padded with full coverage after a plot filled up
+    for i, curve in enumerate(curves):
+        allCurves[i, :len(curve)] = curve
+    
+    return {'towers': np.arange(1, length + 1), \
+            'mean': allCurves.mean(axis=0), \
+            'quantiles': np.percentile(allCurves, \
+                                       [ 100 * q for q in quantiles ], \
+                                       axis=0)}
+
+
+
+def _normal_quantile(prob):
+    '''
+    Inverse of the standard normal distribution function, found by
+    bisection on math.erf. Used for confidence intervals.
+    
+    :@param prob: float, probability between 0 and 1
+    :@return: float, z such that P(Z <= z) = prob
+    '''
+    import math
+    
+    assert 0 < prob < 1, "Probability must be between 0 and 1"
+    low, high = -40.0, 40.0
+    for step in range(100):
+        middle = (low + high) / 2.0
+        if 0.5 * (1 + math.erf(middle / math.sqrt(2))) < prob:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2.0
+
+
+
+def update_fill_stats(stats, result, zValue):
+    '''
+    Adds one fill count to a running statistics dict, in place.
+    
+    The mean and variance use Welford's update, so no result has to be
+    kept. The histogram maps each fill count to how often it came up.
+    'ci' is the confidence interval of the mean from the normal
+    approximation and 'relError' is its half-width over the mean.
+    
+    :@param stats: dict, running statistics; {} to start
+    :@param result: int, towers used to fill one plot
+    :@param zValue: float, normal quantile for the confidence level
+    :@return: dict, the same stats dict
+    '''
+    import math
+    
+    if len(stats) == 0:
+        stats.update( {'n': 0, 'mean': 0.0, 'm2': 0.0, 'var': 0.0, \
+                       'hist': {}, 'ci': (0.0, 0.0), \
+                       'relError': float('inf')} )
+    
+    stats['n'] += 1
+    delta = result - stats['mean']
+    stats['mean'] += delta / float(stats['n'])
+    stats['m2'] += delta * (result - stats['mean'])
+    stats['hist'][result] = stats['hist'].get(result, 0) + 1
+    
+    if stats['n'] > 1:
+        stats['var'] = stats['m2'] / (stats['n'] - 1) #sample variance
+        halfWidth = zValue * math.sqrt(stats['var'] / stats['n'])
+        stats['ci'] = (stats['mean'] - halfWidth, stats['mean'] + halfWidth)
+        stats['relError'] = halfWidth / stats['mean']
+    return stats
+
+
+
+def iter_towersToFill(L, W, n=0, engine='array', method='sweep', \
+                      checks=None, seed=None, workers=1, relError=None, \
+                      minSamples=30, confidence=0.95):
+    '''
+    Streaming version of sample_towersToFill. A generator that yields
+    each fill count as soon as it is done, together with running
+    statistics: count, mean, variance, histogram, confidence interval
+    of the mean and its relative error (see update_fill_stats).
+    
+    The stream ends after n samples, or, if relError is given, once at
+    least minSamples are in and the confidence interval's half-width
+    is within relError of the mean. With n=0 and no relError it runs
+    until the caller stops iterating.
+    
+    Seeds and workers behave as in sample_towersToFill, so a seeded
+    stream gives the same counts in the same order as a seeded call of
+    sample_towersToFill. With workers, blocks of samples are handed out
+    in order, at most two per worker ahead of the caller, and the pool
+    is stopped when the stream ends.
+    
+    The stats dict yielded is the same object every time, updated in
+    place; copy it to keep a snapshot.
+    
+    :@param L: int, length dimension of the plot
+    :@param W: int, width dimension of the plot
+    :@param n: int, most samples; 0 for no limit
+    :@param engine: str, tower pipeline passed on to plot_ntowers
+    :@param method: str, rectangle trimming passed on to plot_ntowers
+    :@param checks: str, check level passed on to plot_ntowers
+    :@param seed: int or RandomState, master seed for per-sample
+                 streams; optional, see _master_seed
+    :@param workers: int, number of worker processes
+    :@param relError: float, target relative error of the mean; optional
+    :@param minSamples: int, samples needed before relError can stop
+    :@param confidence: float, confidence level of the interval
+    :@return: generator, (result, stats) pairs
+    '''
+    import numpy as np
+    
+    for funVars in [L, W, workers, minSamples]:
+        assert isinstance(funVars, int) and bool(funVars > 0), \
+            "%s must be a positive integer." % (funVars)
+    assert isinstance(n, int) and n >= 0, \
+           "n must be an integer and > or = 0"
+    assert relError is None or relError > 0, \
+           "relError must be positive"
+    
+    zValue = _normal_quantile(0.5 + confidence / 2.0)
+    seed = _master_seed(seed)
+    if seed is None and workers > 1:
+        seed = int( np.random.randint(0, 2**31 - 1) )
+    
+    def results():
+        #endless, ordered stream of fill counts
+        if seed is None:
+            while True:
+                yield plot_ntowers(L, W, 0, engine, method, checks)
+        elif workers == 1:
+            i = 0
+            while True:
+                yield plot_ntowers(L, W, 0, engine, method, checks, \
+                                   _sample_rng(seed, i))
+                i += 1
+        else:
+            import collections
+            import itertools
+            import multiprocessing
+            
+            blockSize = 4 #small blocks keep the stream flowing
+            if n == 0:
+                starts = itertools.count(0, blockSize)
+            else: #no block past the n samples asked for
+                starts = iter( range(0, n, blockSize) )
+            pool = multiprocessing.Pool(workers)
+            pending = collections.deque() #blocks handed out, in order
+            
+            def submit(count):
+                for start in itertools.islice(starts, count):
+                    stop = start + blockSize if n == 0 \
+                           else min(start + blockSize, n)
+                    pending.append( pool.apply_async(_sample_block, \
+                        [(L, W, seed, start, stop, engine, method, checks)]) )
+            
+            try:
+                submit(2 * workers) #enough to keep every worker busy
+                while pending:
+                    block = pending.popleft().get()
+                    submit(1) #replace it, so work stays bounded
+                    for result in block:
+                        yield result
+            finally:
+                pool.terminate() #stop work nobody will collect
+                pool.join()
+    
+    stats = {}
+    stream = results()
+    try:
+        for result in stream:
+            update_fill_stats(stats, result, zValue)
+            yield result, stats
+            if n != 0 and stats['n'] >= n:
+                break
+            if relError is not None and stats['n'] >= minSamples \
+               and stats['relError'] <= relError:
+                break
+    finally:
+        stream.close()
+
+
+
+def _sweep_batch(freeStack):
+    '''
+    Corner sweep of get_largest_rectangle done for a whole stack of
+    plots at once with array operations.
+    
+    For every free cell the rectangle sweeping right then down and the
+    one sweeping down then right are measured with run lengths, as in
+    get_largest_rect. The downward (and rightward) extension is grown
+    one row offset at a time for all cells and plots together.
+    
+    :@param freeStack: ndarray, bool, (batch, L, W) new coverage
+    :@return: tuple, (runRight, heightRD, runDown, widthDR) int arrays,
+              each (batch, L, W); zero where a cell isn't free
+    '''
+    import numpy as np
+    
+    batch, length, width = freeStack.shape
+    runRight = np.zeros((batch, length, width + 1), dtype='int32')
+    runDown = np.zeros((batch, length + 1, width), dtype='int32')
+    for col in range(width - 1, -1, -1):
+        runRight[:, :, col] = (runRight[:, :, col + 1] + 1) \
+                              * freeStack[:, :, col]
+    for row in range(length - 1, -1, -1):
+        runDown[:, row] = (runDown[:, row + 1] + 1) * freeStack[:, row]
+    runRight = runRight[:, :, :width]
+    runDown = runDown[:, :length]
+    
+    heightRD = np.zeros(freeStack.shape, dtype='int32')
+    stillOk = freeStack.copy()
+    for d in range(length): #can row i+d still be added below row i?
+        stillOk[:, length - d:] = False
+        stillOk[:, :length - d] &= \
+            runRight[:, d:] >= runRight[:, :length - d]
+        heightRD += stillOk
+        if not stillOk.any():
+            break
+    
+    widthDR = np.zeros(freeStack.shape, dtype='int32')
+    stillOk = freeStack.copy()
+    for d in range(width): #can column j+d still be added right of j?
+        stillOk[:, :, width - d:] = False
+        stillOk[:, :, :width - d] &= \
+            runDown[:, :, d:] >= runDown[:, :, :width - d]
+        widthDR += stillOk
+        if not stillOk.any():
+            break
+    
+    return runRight, heightRD, runDown, widthDR
+
+
+
+def plot_ntowers_batch(L, W, batch, n=0, checks=None, rng=None):
+    '''
+    Vectorized plot_ntowers for many independent plots at once. The
+    plots are a (batch, L, W) boolean stack and every step places one
+    tower in each unfinished plot with a handful of array operations.
+    
+    Numpy module must be available to function.
+    
+    Each step draws a (batch, 4) array of random towers, builds their
+    overlap-free masks against the stack, runs the corner sweep of
+    get_largest_rectangle on all of them with _sweep_batch and adds the
+    chosen rectangles. Candidates are ordered and ties broken as in
+    get_largest_rectangle, so every plot follows the same process as
+    plot_ntowers with method='sweep'; only the random draws differ.
+    Plots that are full drop out of the step until the batch is done.
+    
+    :@param L: int, length of the plot; stored as rows in an array
+    :@param W: int, width of plot; stored as columns in an array
+    :@param batch: int, number of plots filled together
+    :@param n: int, towers built; if 0, will count towers to fill.
+    :@param checks: str, check level; None uses CHECK_LEVEL
+    :@param rng: RandomState or seed, random stream; see make_rng
+    :@return: list, plot_ntowers output for each plot in the batch
+    '''
+    import numpy as np
+    
+    for funVars in [L, W, batch]:
+        assert isinstance(funVars, int) and bool(funVars > 0), \
+            "%s must be a positive integer." % (funVars)
+    assert isinstance(n, int) and n >= 0, \
+           "n must be an integer and > or = 0"
+    level = _check_level(checks)
+    rng = make_rng(rng)
+    
+    totalArea = L * W
+    covStack = np.zeros((batch, L, W), dtype='bool')
+    covered = np.zeros(batch, dtype='int64') #area covered per plot
+    nBuilt = np.zeros(batch, dtype='int64')
+    active = np.ones(batch, dtype='bool')
+    rowIdx = np.arange(L)
+    colIdx = np.arange(W)
+    
+    while active.any():
+        plots = np.nonzero(active)[0]
+        size = len(plots)
+        cols = np.sort(rng.randint(0, W, (size, 2)), axis=1)
+        rows = np.sort(rng.randint(0, L, (size, 2)), axis=1)
+        #one random tower per unfinished plot, as (r1, r2, c1, c2)
+        inRows = (rowIdx >= rows[:, :1]) & (rowIdx <= rows[:, 1:])
+        inCols = (colIdx >= cols[:, :1]) & (colIdx <= cols[:, 1:])
+        freeStack = inRows[:, :, None] & inCols[:, None, :] \
+                    & ~covStack[plots]
+        #overlap-free part of every tower
+        
+        runRight, heightRD, runDown, widthDR = _sweep_batch(freeStack)
+        areas = np.stack( (runRight * heightRD, runDown * widthDR), \
+                          axis=3 ).reshape(size, 2 * L * W)
+        #candidates per cell in get_largest_rectangle's order
+        largest = areas.max(axis=1)
+        ties = (areas == largest[:, None]) & (largest[:, None] > 0)
+        nTies = ties.sum(axis=1)
+        pick = np.floor( rng.random_sample(size) * (nTies + 1) )
+        pick = np.maximum(pick, 1).astype('int64')
+        #tie list is the first largest plus every largest, as before
+        chosen = np.argmax(np.cumsum(ties, axis=1) >= pick[:, None], \
+                           axis=1)
+        
+        hit = largest > 0 #towers that add any new coverage
+        cell = chosen // 2
+        r1 = cell // W
+        c1 = cell % W
+        sweepDown = (chosen % 2) == 1
+        at = (np.arange(size), r1, c1)
+        r2 = r1 + np.where(sweepDown, runDown[at], heightRD[at]) - 1
+        c2 = c1 + np.where(sweepDown, widthDR[at], runRight[at]) - 1
+        
+        trimRows = (rowIdx >= r1[:, None]) & (rowIdx <= r2[:, None])
+        trimCols = (colIdx >= c1[:, None]) & (colIdx <= c2[:, None])
+        trimStack = trimRows[:, :, None] & trimCols[:, None, :] \
+                    & hit[:, None, None]
+        if level != 'off':
+            assert not (trimStack & ~freeStack).any(), \
+                   "Trimmed tower must lie inside the new coverage"
+        covStack[plots] |= trimStack
+        covered[plots] += np.where(hit, largest, 0)
+        nBuilt[plots] += 1
+        
+        if n != 0:
+            active[plots] = nBuilt[plots] < n
+        else:
+            active[plots] = covered[plots] < totalArea
+    
+    if level != 'off':
+        assert np.array_equal(covStack.sum(axis=(1, 2)), covered), \
+               "Covered area must match the plots"
+    
+    if n == 0:
+        return [ int(built) for built in nBuilt ]
+    else:
+        return [ (int(area), round(area / float(totalArea), 3)) \
+                 for area in covered ]
+
+
+
+def sample_towersToFill_batch(L, W, n=100, batch=256, checks=None, \
+                              seed=None):
+    '''
+    Vectorized sample_towersToFill. The n samples are filled in groups
+    of up to batch plots with plot_ntowers_batch.
+    
+    The results follow the same distribution as sample_towersToFill
+    with method='sweep', but a seed does not reproduce its list since
+    random numbers are drawn in a different order.
+    
+    :@param L: int, length dimension of the plot
+    :@param W: int, width dimension of the plot
+    :@param n: int, number of samples
+    :@param batch: int, most plots filled together; bounds memory
+    :@param checks: str, check level passed on to plot_ntowers_batch
+    :@param seed: int or RandomState, random stream; see make_rng
+    :@return: list, towers used to fill the plot for each sample
+    '''
+    for funVars in [L, W, n, batch]:
+        assert isinstance(funVars, int) and bool(funVars > 0), \
+            "%s must be a positive integer." % (funVars)
+    
+    rng = make_rng(seed)
+    
+    resultList = []
+    while len(resultList) < n:
+        size = min(batch, n - len(resultList))
+        resultList.extend( plot_ntowers_batch(L, W, size, 0, checks, rng) )
+    
+    assert len(resultList) == n
     return resultList
-        
\ No newline at end of file
@@ -0,0 +1,239 @@
+'''
+Exact towers-to-fill for small plots, from the Markov chain of coverage
+states that plot_ntowers steps through, instead of Monte Carlo.
+
+A state is the set of covered cells. Every tower is drawn as in
+make_random_rect, and each tie its trimming could pick (get_largest_rect,
+'sweep' or 'histogram') is followed with its probability, so the chain
+moves exactly as the simulator does. A tower that adds nothing leaves
+the state as it is. Coverage only grows, so the chain is solved state by
+state from the full plot back to the empty one.
+
+Transitions are worked out once per state, and the trimming ties once
+per distinct free window. With method='histogram' the trimming doesn't
+depend on orientation, so states that are reflections of each other
+(or transpositions, for square plots) are merged into one. The corner
+sweep scans in a fixed order and breaks ties towards the first
+candidate, so for method='sweep' every state stands alone.
+
+The number of states grows quickly with the plot. Up to 3x4 takes
+seconds; 4x4 takes under a minute with method='histogram' and about
+five with 'sweep'.
+
+:@funct exact_towersToFill: distribution and moments of towers to fill
+'''
+
+import commtower as ct
+
+
+MAX_STATES = 200000
+
+
+def _rect_probabilities(L, W):
+    '''
+    Every tower make_random_rect can draw, with its probability. Each
+    dimension draws two indices and sorts them, so a range of one index
+    has probability 1/L**2 and a longer range 2/L**2.
+    
+    :@param L: int, number of rows in the plot
+    :@param W: int, number of columns in the plot
+    :@return: list, ((row1, row2, col1, col2), probability) pairs
+    '''
+    rowRanges = [ ( (r1, r2), (1.0 if r1 == r2 else 2.0) / L**2 ) \
+                  for r1 in range(L) for r2 in range(r1, L) ]
+    colRanges = [ ( (c1, c2), (1.0 if c1 == c2 else 2.0) / W**2 ) \
+                  for c1 in range(W) for c2 in range(c1, W) ]
+    return [ ( rows + cols, pRow * pCol ) \
+             for rows, pRow in rowRanges for cols, pCol in colRanges ]
+
+
+
+def _symmetries(L, W, method):
+    '''
+    Maps of a coverage grid onto grids with the same towers-to-fill
+    distribution under the given trimming method.
+    
+    :@param L: int, number of rows in the plot
+    :@param W: int, number of columns in the plot
+    :@param method: str, 'sweep' or 'histogram'
+    :@return: list, functions from a bool grid to a bool grid
+    '''
+    import numpy as np
+    
+    if method == 'sweep':
+        return [ lambda grid: grid ] #the sweep has a direction
+    maps = [ lambda grid: grid, np.flipud, np.fliplr, \
+             lambda grid: grid[::-1, ::-1] ]
+    if L == W:
+        maps += [ lambda grid, f=f: f(grid).T for f in list(maps) ]
+    return maps
+
+
+
+def _state_key(grid, symmetries):
+    '''
+    Key shared by all the grids symmetric to this one: the smallest of
+    their raw bytes.
+    
+    :@param grid: ndarray, bool, covered cells
+    :@param symmetries: list, from _symmetries
+    :@return: str, key of the state
+    '''
+    import numpy as np
+    
+    return min( np.ascontiguousarray(f(grid)).tostring() \
+                for f in symmetries )
+
+
+
+def _trim_choices(freeWindow, method, memo):
+    '''
+    Every rectangle get_largest_rect can trim a free window to, with
+    its probability. Results are kept in memo by window, since the same
+    free windows turn up in many states.
+    
+    :@param freeWindow: ndarray, bool, True where coverage is new
+    :@param method: str, 'sweep' or 'histogram'
+    :@param memo: dict, window shape and bytes to earlier results
+    :@return: list, ((row1, row2, col1, col2), probability) pairs in
+              window coordinates; empty if no cell is free
+    '''
+    key = (freeWindow.shape, freeWindow.tostring())
+    if key not in memo:
+        if method == 'histogram':
+            ties = ct._largest_rectangles(freeWindow)
+        else:
+            ties = [ tie[1:] for tie in ct._sweep_ties(freeWindow) ]
+        choices = {}
+        for tie in ties: #a rectangle listed twice is twice as likely
+            choices[tie] = choices.get(tie, 0.0) + 1.0 / len(ties)
+        memo[key] = sorted( choices.items() )
+    return memo[key]
+
+
+
+def _transitions(grid, method, rects, symmetries, memo):
+    '''
+    Where one tower takes a coverage state, and how likely each move is.
+    
+    :@param grid: ndarray, bool, covered cells
+    :@param method: str, 'sweep' or 'histogram'
+    :@param rects: list, from _rect_probabilities
+    :@param symmetries: list, from _symmetries
+    :@param memo: dict, passed on to _trim_choices
+    :@return: tuple, (probability the tower adds nothing, dict from
+              the key of each new state to (its grid, probability))
+    '''
+    stay = 0.0
+    moves = {}
+    for (r1, r2, c1, c2), pRect in rects:
+        freeWindow = ~grid[r1:r2+1, c1:c2+1]
+        choices = _trim_choices(freeWindow, method, memo)
+        if len(choices) == 0:
+            stay += pRect #wasted tower
+            continue
+        for (t1, t2, u1, u2), pTrim in choices:
+            newGrid = grid.copy()
+            newGrid[r1+t1:r1+t2+1, c1+u1:c1+u2+1] = True
+            key = _state_key(newGrid, symmetries)
+            oldGrid, p = moves.get(key, (newGrid, 0.0))
+            moves[key] = (oldGrid, p + pRect * pTrim)
+    return stay, moves
+
+
+
+def exact_towersToFill(L, W, method='sweep', maxTowers=None, tol=1e-12, \
+                       maxStates=MAX_STATES):
+    '''
+    Exact distribution of the number of towers plot_ntowers(L, W, 0)
+    builds to fill the plot, for any engine.
+    
+    First every coverage state reachable from the empty plot is found,
+    with its transitions. The expected number of towers and its
+    variance then follow state by state from the fullest states down:
+    a state that a wasted tower leaves in place with probability q
+    needs 1/(1-q) towers to leave, plus what the states it moves to
+    need. The distribution is found by pushing the probability mass
+    forward one tower at a time; it has an infinite tail, so this stops
+    once less than tol of the mass is left, or after maxTowers towers.
+    
+    :@param L: int, length dimension of the plot
+    :@param W: int, width dimension of the plot
+    :@param method: str, 'sweep' or 'histogram' rectangle trimming
+    :@param maxTowers: int, longest run to give a probability for;
+                       None to go on until tol is reached
+    :@param tol: float, probability mass left over at which to stop
+    :@param maxStates: int, states to explore before giving up
+    :@return: dict, 'distribution' ndarray of P(towers = k) for k from
+              0, 'tail' mass beyond it, 'expected' and 'variance' of
+              the number of towers, and 'states' explored
+    '''
+    import numpy as np
+    
+    assert isinstance(L, int) and L > 0, \
+           "Length must be a positive integer."
+    assert isinstance(W, int) and W > 0, \
+           "Width must be a positive integer."
+    assert method in ('sweep', 'histogram'), \
+           "method must be 'sweep' or 'histogram'"
+    assert maxTowers is None or isinstance(maxTowers, int) \
+           and maxTowers > 0, "maxTowers must be a positive integer."
+    
+    rects = _rect_probabilities(L, W)
+    symmetries = _symmetries(L, W, method)
+    memo = {}
+    
+    empty = np.zeros((L, W), dtype=bool)
+    start = _state_key(empty, symmetries)
+    chain = {} #state key to (covered cells, stay probability, moves)
+    toVisit = [ (start, empty) ]
+    while toVisit:
+        key, grid = toVisit.pop()
+        if key in chain:
+            continue
+        assert len(chain) < maxStates, \
+               "More than %d coverage states; plot too large" % maxStates
+        stay, moves = _transitions(grid, method, rects, symmetries, memo)
+        chain[key] = ( int(grid.sum()), stay, \
+                       [ (newKey, p) for newKey, (newGrid, p) \
+                         in moves.items() ] )
+        toVisit.extend( (newKey, newGrid) for newKey, (newGrid, p) \
+                        in moves.items() if newKey not in chain )
+    
+    order = sorted(chain, key=lambda key: chain[key][0], reverse=True)
+    expected = {}
+    second = {} #E[towers**2]
+    for key in order: #every move goes to a fuller state, already done
+        covered, stay, moves = chain[key]
+        if covered == L * W:
+            expected[key] = second[key] = 0.0
+            continue
+        leave = 1.0 - stay
+        expected[key] = ( 1.0 + sum(p * expected[newKey] \
+                                    for newKey, p in moves) ) / leave
+        second[key] = ( 1.0 + 2 * stay * expected[key] \
+                        + sum(p * (2 * expected[newKey] + second[newKey]) \
+                              for newKey, p in moves) ) / leave
+    
+    distribution = [0.0]
+    mass = {start: 1.0} #probability of each unfilled state so far
+    while sum(mass.values()) > tol and \
+          (maxTowers is None or len(distribution) <= maxTowers):
+        newMass = {}
+        filled = 0.0
+        for key, m in mass.items():
+            covered, stay, moves = chain[key]
+            newMass[key] = newMass.get(key, 0.0) + m * stay
+            for newKey, p in moves:
+                if chain[newKey][0] == L * W:
+                    filled += m * p
+                else:
+                    newMass[newKey] = newMass.get(newKey, 0.0) + m * p
+        distribution.append(filled)
+        mass = newMass
+    
+    return {'distribution': np.array(distribution), \
+            'tail': sum(mass.values()), \
+            'expected': expected[start], \
+            'variance': second[start] - expected[start]**2, \
+            'states': len(chain)}
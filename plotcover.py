@@ -1,5 +1,6 @@
 '''
-Displays arrays in a graphical format for easier visualization.
+Displays arrays in a graphical format for easier visualization, on
+screen or saved straight to image files without a display.
 '''
 
 def plot_oneArray(inArray):
@@ -27,4 +28,143 @@ def plot_towersToFill(resultList):
     
     plt.hist(resultList)
     plt.show()
-    plt.close()
\ No newline at end of file
+    plt.close()
+
+
+def downsample_plot(inArray, maxSide=1000):
+    '''
+    Shrinks a large array for display by averaging blocks of cells.
+    A bool coverage array shows the fraction of each block covered; any
+    other array, such as a 0/1 coverage plot or a cell_stat grid, shows
+    the mean of each block's values, leaving out NaN cells (NaN if all
+    of a block is). Arrays no bigger than maxSide on either side come
+    back unchanged.
+    '''
+    import numpy as np
+
+    L, W = inArray.shape
+    factor = -(-max(L, W) // maxSide) #cells per block side, rounded up
+    if factor <= 1:
+        return inArray
+
+    rowStarts = np.arange(0, L, factor)
+    colStarts = np.arange(0, W, factor)
+
+    def block_sums(cells, dtype):
+        cellSums = np.add.reduceat(cells, rowStarts, axis=0, dtype=dtype)
+        return np.add.reduceat(cellSums, colStarts, axis=1)
+        #edge blocks may be smaller
+
+    if inArray.dtype == bool:
+        blockRows = np.diff( np.append(rowStarts, L) )
+        blockCols = np.diff( np.append(colStarts, W) )
+        return block_sums(inArray, 'uint32') \
+               / np.outer(blockRows, blockCols).astype(float)
+
+    values = inArray.astype(float)
+    known = ~np.isnan(values)
+    values[~known] = 0.0
+    with np.errstate(invalid='ignore'): #all-NaN blocks stay NaN
+        return block_sums(values, 'float64') \
+               / block_sums(known, 'uint32')
+
+
+
+def count_towersToFill(resultList, counts=None):
+    '''
+    Adds results from sample_towersToFill, or a chunk of streamed
+    results, to integer counts per number of towers; counts[k] is the
+    number of samples that took k towers. Returns the updated counts,
+    grown if a result is past the end.
+    '''
+    import numpy as np
+
+    chunk = np.bincount( np.asarray(resultList, dtype='int64') )
+    if counts is None:
+        return chunk
+    if len(chunk) > len(counts):
+        chunk[:len(counts)] += counts
+        return chunk
+    counts[:len(chunk)] += chunk
+    return counts
+
+
+
+def new_export_figure(size=(6, 6), dpi=100):
+    '''
+    Makes a figure drawn by the Agg backend alone, for saving figures
+    without a display. Pass it to the save functions to reuse it.
+    '''
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=size, dpi=dpi)
+    FigureCanvasAgg(fig)
+    fig.add_subplot(111)
+    return fig
+
+
+
+def save_oneArray(inArray, path, fig=None, maxSide=1000):
+    '''
+    Saves a coverage or cell_stat array as an image file without
+    showing it. Large arrays are downsampled first, see downsample_plot.
+    '''
+    if fig is None:
+        fig = new_export_figure()
+    ax = fig.axes[0]
+    ax.cla()
+    L, W = inArray.shape
+    ax.imshow(downsample_plot(inArray, maxSide), aspect='equal', \
+              interpolation='nearest', \
+              extent=(-0.5, W - 0.5, L - 0.5, -0.5))
+    #axes keep the cell coordinates of the full array
+    fig.savefig(path)
+
+
+
+def save_towersToFill(counts, path, fig=None):
+    '''
+    Saves a histogram of towers needed to fill from the counts of
+    count_towersToFill, without showing it. Only one bar per number of
+    towers is drawn, however many samples were counted.
+    '''
+    import numpy as np
+
+    if fig is None:
+        fig = new_export_figure()
+    ax = fig.axes[0]
+    ax.cla()
+    ax.set_aspect('auto') #cla keeps an image's equal aspect
+    towers = np.flatnonzero(counts)
+    assert len(towers) > 0, "No results to plot"
+    ax.hist(towers, bins=np.arange(towers[0], towers[-1] + 2) - 0.5, \
+            weights=counts[towers], histtype='stepfilled')
+    ax.set_xlabel('Towers to fill')
+    ax.set_ylabel('Samples')
+    fig.savefig(path)
+
+
+
+def export_figures(items, fig=None):
+    '''
+    Writes many figures in one pass through a single reused figure.
+    items holds (path, kind, data) entries: kind 'array' for a coverage
+    array, 'counts' for counts from count_towersToFill, or 'results'
+    for a list of sample_towersToFill results. Returns the paths
+    written.
+    '''
+    if fig is None:
+        fig = new_export_figure()
+    written = []
+    for path, kind, data in items:
+        if kind == 'array':
+            save_oneArray(data, path, fig)
+        elif kind == 'counts':
+            save_towersToFill(data, path, fig)
+        elif kind == 'results':
+            save_towersToFill(count_towersToFill(data), path, fig)
+        else:
+            raise ValueError("Unknown figure kind: %s" % kind)
+        written.append(path)
+    return written
@@ -0,0 +1,237 @@
+'''
+Parameter sweeps of sample_towersToFill over many plot dimensions, run
+across worker processes and saved to disk as they finish.
+
+Each (L, W) is one job. Jobs are handed out largest plot first so the
+slowest ones don't start last. Finished jobs are appended to a columnar
+store: one raw int32 file per column (L, W, sample, towers) in the
+output directory. A checkpoint file records the finished jobs and the
+row count they account for, along with the seed, engine, method and
+checks of the sweep. An interrupted sweep restarted on the same
+directory drops any rows past the checkpoint and only runs the jobs
+that are left; it must be restarted with the same settings, so one
+store never mixes results of two configurations.
+
+Jobs are seeded, so a job's results are the same as
+sample_towersToFill(L, W, n, seed=seed) whether it ran first or after
+a resume.
+
+:@funct dimension_grid: every (L, W) pair from lists of lengths, widths
+:@funct sweep_towersToFill: run or resume a sweep into a directory
+:@funct load_sweep: read a sweep's columns back
+'''
+
+import commtower as ct
+
+
+COLUMNS = ['L', 'W', 'sample', 'towers']
+CHECKPOINT = 'checkpoint.json'
+
+
+def dimension_grid(lengths, widths):
+    '''
+    Every combination of the given plot lengths and widths.
+    
+    :@param lengths: list, plot lengths (rows)
+    :@param widths: list, plot widths (columns)
+    :@return: list, (L, W) pairs
+    '''
+    return [ (L, W) for L in lengths for W in widths ]
+
+
+
+def _sweep_job(args):
+    '''
+    Fills one plot size for a sweep. Top level so that multiprocessing
+    can send it to worker processes.
+    
+    :@param args: tuple, (L, W, n, seed, engine, method, checks)
+    :@return: tuple, (L, W, list of towers used per sample)
+    '''
+    L, W, n, seed, engine, method, checks = args
+    return L, W, ct.sample_towersToFill(L, W, n, engine, method, checks, \
+                                        seed)
+
+
+
+def _read_checkpoint(outDir):
+    '''
+    Reads the checkpoint of a sweep directory.
+    
+    :@param outDir: str, sweep directory
+    :@return: dict, 'done' list of [L, W, n], 'rows' count and 'params'
+              of the sweep, None for a new directory
+    '''
+    import json
+    import os
+    
+    path = os.path.join(outDir, CHECKPOINT)
+    if not os.path.exists(path):
+        return {'done': [], 'rows': 0, 'params': None}
+    with open(path) as checkFile:
+        return json.load(checkFile)
+
+
+
+def _write_checkpoint(outDir, checkpoint):
+    '''
+    Replaces the checkpoint of a sweep directory in one rename, so a
+    crash leaves either the old or the new checkpoint.
+    
+    :@param outDir: str, sweep directory
+    :@param checkpoint: dict, as from _read_checkpoint
+    '''
+    import json
+    import os
+    
+    path = os.path.join(outDir, CHECKPOINT)
+    with open(path + '.tmp', 'w') as checkFile:
+        json.dump(checkpoint, checkFile)
+        checkFile.flush()
+        os.fsync(checkFile.fileno())
+    os.rename(path + '.tmp', path)
+
+
+
+def _append_rows(outDir, L, W, results):
+    '''
+    Appends one job's results to every column file.
+    
+    :@param outDir: str, sweep directory
+    :@param L: int, length dimension of the plot
+    :@param W: int, width dimension of the plot
+    :@param results: list, towers used per sample
+    '''
+    import os
+    import numpy as np
+    
+    n = len(results)
+    columns = {'L': np.repeat(L, n), 'W': np.repeat(W, n), \
+               'sample': np.arange(n), 'towers': np.asarray(results)}
+    for name in COLUMNS:
+        with open(os.path.join(outDir, name + '.i32'), 'ab') as colFile:
+            colFile.write( columns[name].astype('<i4').tostring() )
+            colFile.flush()
+            os.fsync(colFile.fileno())
+
+
+
+def _truncate_columns(outDir, rows):
+    '''
+    Cuts every column file back to the given number of rows, dropping
+    what a job wrote after the last checkpoint.
+    
+    :@param outDir: str, sweep directory
+    :@param rows: int, rows covered by the checkpoint
+    '''
+    import os
+    
+    for name in COLUMNS:
+        path = os.path.join(outDir, name + '.i32')
+        if os.path.exists(path):
+            with open(path, 'r+b') as colFile:
+                colFile.truncate(4 * rows)
+
+
+
+def sweep_towersToFill(sizes, n, outDir, seed=0, workers=1, \
+                       engine='rect', method='sweep', checks=None):
+    '''
+    Runs sample_towersToFill for every plot size and streams the
+    results to a columnar store in outDir, or resumes such a sweep.
+    
+    The seed, engine, method and checks are stored in the checkpoint
+    of a new directory; resuming with others is refused, since the
+    jobs already done would not match the new ones.
+    
+    Jobs already in the checkpoint are skipped. The rest are sorted by
+    plot area, largest first, and spread over a pool of workers. Each
+    finished job is appended to the column files and then recorded in
+    the checkpoint.
+    
+    :@param sizes: list, (L, W) plot dimensions; see dimension_grid
+    :@param n: int or dict, samples per size, or a dict from (L, W) to
+               samples
+    :@param outDir: str, sweep directory; made if missing
+    :@param seed: int, master seed used for every size
+    :@param workers: int, number of worker processes
+    :@param engine: str, tower pipeline passed on to plot_ntowers
+    :@param method: str, rectangle trimming passed on to plot_ntowers
+    :@param checks: str, check level passed on to plot_ntowers
+    :@return: int, number of jobs run by this call
+    '''
+    import os
+    
+    for L, W in sizes:
+        for dimension in [L, W]:
+            assert isinstance(dimension, int) and dimension > 0, \
+                   "Plot dimensions must be positive integers."
+    assert isinstance(workers, int) and workers > 0, \
+           "workers must be a positive integer."
+    
+    if not os.path.isdir(outDir):
+        os.makedirs(outDir)
+    checkpoint = _read_checkpoint(outDir)
+    params = {'seed': seed, 'engine': engine, 'method': method, \
+              'checks': checks}
+    if checkpoint.get('params') is None:
+        assert checkpoint['rows'] == 0, \
+               "Checkpoint in %s doesn't record the sweep's settings" \
+               % outDir
+        checkpoint['params'] = params
+        _write_checkpoint(outDir, checkpoint)
+    assert checkpoint['params'] == params, \
+           "Sweep in %s was run with %s, not %s" % \
+           (outDir, checkpoint['params'], params)
+    _truncate_columns(outDir, checkpoint['rows'])
+    
+    done = set( tuple(job) for job in checkpoint['done'] )
+    jobs = []
+    for L, W in sizes:
+        samples = n[(L, W)] if isinstance(n, dict) else n
+        if (L, W, samples) not in done:
+            jobs.append( (L, W, samples, seed, engine, method, checks) )
+    jobs.sort(key=lambda job: job[0] * job[1], reverse=True)
+    
+    if workers == 1:
+        finished = ( _sweep_job(job) for job in jobs )
+    else:
+        import multiprocessing
+        
+        pool = multiprocessing.Pool(workers)
+        finished = pool.imap_unordered(_sweep_job, jobs)
+    
+    try:
+        for L, W, results in finished:
+            _append_rows(outDir, L, W, results)
+            checkpoint['done'].append( [L, W, len(results)] )
+            checkpoint['rows'] += len(results)
+            _write_checkpoint(outDir, checkpoint)
+    finally:
+        if workers > 1:
+            pool.terminate()
+            pool.join()
+    
+    return len(jobs)
+
+
+
+def load_sweep(outDir):
+    '''
+    Reads the checkpointed rows of a sweep back as columns.
+    
+    :@param outDir: str, sweep directory
+    :@return: dict, column name to int32 ndarray
+    '''
+    import os
+    import numpy as np
+    
+    rows = _read_checkpoint(outDir)['rows']
+    columns = {}
+    for name in COLUMNS:
+        path = os.path.join(outDir, name + '.i32')
+        if os.path.exists(path):
+            columns[name] = np.fromfile(path, dtype='<i4')[:rows]
+        else:
+            columns[name] = np.zeros(0, dtype='<i4')
+    return columns
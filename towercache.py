@@ -0,0 +1,163 @@
+'''
+On-disk cache of sample_towersToFill results, so repeated analysis of
+the same plot dimensions doesn't refill the same plots.
+
+Seeded runs give every sample its own random stream, so sample i of
+(L, W, seed) is the same number whenever it is computed. The cache
+stores those numbers per (L, W, seed, method, algorithm version) as
+raw little-endian uint32 files. Asking for more samples than are
+stored only computes the missing ones and appends them, under an
+exclusive lock on the file so that processes extending the same key
+don't write the same samples twice. Once the cache
+directory grows past its size bound, the least recently used files
+are deleted.
+
+:@funct cached_towersToFill: sample_towersToFill through the cache
+:@funct evict_cache: trim the cache directory to a size bound
+'''
+
+import commtower as ct
+
+
+CACHE_DIR = '.towercache'
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def cache_path(L, W, seed, method='sweep', cacheDir=CACHE_DIR):
+    '''
+    File holding the cached results of one parameter set.
+    
+    :@param L: int, length dimension of the plot
+    :@param W: int, width dimension of the plot
+    :@param seed: int, master seed of the run
+    :@param method: str, rectangle trimming used
+    :@param cacheDir: str, cache directory
+    :@return: str, path of the cache file
+    '''
+    import os
+    
+    name = 'towers_%dx%d_seed%d_%s_v%d.u32' % \
+           (L, W, seed, method, ct.ALGORITHM_VERSION)
+    return os.path.join(cacheDir, name)
+
+
+
+def read_cached(path):
+    '''
+    Reads the results stored in one cache file. A partly written last
+    record, left by an interrupted append, is ignored.
+    
+    :@param path: str, path of the cache file
+    :@return: ndarray, uint32, stored results in sample order
+    '''
+    import os
+    import numpy as np
+    
+    if not os.path.exists(path):
+        return np.zeros(0, dtype='<u4')
+    with open(path, 'rb') as cacheFile:
+        raw = cacheFile.read()
+    whole = len(raw) - len(raw) % 4 #bytes in complete records
+    return np.frombuffer(raw[:whole], dtype='<u4')
+
+
+
+def evict_cache(cacheDir=CACHE_DIR, maxBytes=MAX_CACHE_BYTES, keep=()):
+    '''
+    Deletes the least recently used cache files until the directory is
+    within maxBytes. Reading or writing a file through
+    cached_towersToFill counts as a use.
+    
+    :@param cacheDir: str, cache directory
+    :@param maxBytes: int, size bound of the directory in bytes
+    :@param keep: list, paths never to delete, such as the one in use
+    :@return: list, paths that were deleted
+    '''
+    import os
+    
+    if not os.path.isdir(cacheDir):
+        return []
+    
+    files = []
+    for name in os.listdir(cacheDir):
+        if name.startswith('towers_') and name.endswith('.u32'):
+            path = os.path.join(cacheDir, name)
+            info = os.stat(path)
+            files.append( (info.st_mtime, info.st_size, path) )
+    files.sort() #oldest use first
+    
+    total = sum(size for used, size, path in files)
+    deleted = []
+    for used, size, path in files:
+        if total <= maxBytes:
+            break
+        if path in keep:
+            continue
+        os.remove(path)
+        total -= size
+        deleted.append(path)
+    return deleted
+
+
+
+def cached_towersToFill(L, W, n=100, seed=0, method='sweep', \
+                        engine='rect', workers=1, checks=None, \
+                        cacheDir=CACHE_DIR, maxBytes=MAX_CACHE_BYTES):
+    '''
+    Same list as sample_towersToFill(L, W, n, seed=seed), served from
+    the cache where possible.
+    
+    Stored samples are read back. Missing ones, from the number stored
+    up to n, are computed with sample_towersToFill's start argument
+    and appended to the file. The append holds an exclusive flock and
+    first counts the records again, writing only those still missing,
+    since another process may have extended the file in the meantime.
+    The cache is then trimmed to maxBytes.
+    The engine and workers don't change the results, so they are not
+    part of the key.
+    
+    :@param L: int, length dimension of the plot
+    :@param W: int, width dimension of the plot
+    :@param n: int, number of samples
+    :@param seed: int, master seed of the run; required for caching
+    :@param method: str, rectangle trimming passed on to plot_ntowers
+    :@param engine: str, tower pipeline used for missing samples
+    :@param workers: int, worker processes for missing samples
+    :@param checks: str, check level passed on to plot_ntowers
+    :@param cacheDir: str, cache directory
+    :@param maxBytes: int, size bound of the cache directory in bytes
+    :@return: list, towers used to fill the plot for each sample
+    '''
+    import fcntl
+    import os
+    import numpy as np
+    
+    assert isinstance(seed, int) and seed >= 0, \
+           "Caching needs a non-negative integer seed"
+    assert isinstance(n, int) and n > 0, "n must be a positive integer."
+    
+    path = cache_path(L, W, seed, method, cacheDir)
+    stored = read_cached(path)
+    
+    if len(stored) < n:
+        have = len(stored)
+        newResults = ct.sample_towersToFill(L, W, n - have, engine, method, \
+                                            checks, seed, workers, \
+                                            start=have)
+        if not os.path.isdir(cacheDir):
+            os.makedirs(cacheDir)
+        records = np.append(stored, newResults).astype('<u4')
+        with open(path, 'ab') as cacheFile:
+            fcntl.flock(cacheFile, fcntl.LOCK_EX) #released on close
+            now = os.fstat( cacheFile.fileno() ).st_size // 4
+            #complete records, counting other processes' appends
+            if now < n:
+                cacheFile.truncate(4 * now) #drop any partial record
+                cacheFile.write( records[now:].tostring() )
+        resultList = [ int(result) for result in stored ] + newResults
+    else:
+        resultList = [ int(result) for result in stored[:n] ]
+        os.utime(path, None) #mark as recently used
+    
+    evict_cache(cacheDir, maxBytes, keep=(path,))
+    return resultList
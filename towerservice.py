@@ -0,0 +1,435 @@
+'''
+A long-lived simulation service for sample_towersToFill, so that short
+analysis jobs don't each pay for starting worker processes.
+
+The service keeps a warm pool of worker processes. Requests for
+(L, W, n, seed) come in from the same process through
+submit_towersToFill and submit_batch, or from other processes over a
+local socket through request_towersToFill.
+
+The samples of a plot and seed are split into fixed blocks of
+blockSize samples, each run as one pool task. Concurrent requests for
+the same plot and seed share their blocks, so each block is computed
+once, for whichever request asked first. Results stream back block by
+block, in sample order, as the blocks finish.
+
+Messages on the socket are pickled, so a client that knows the key can
+run code in the service. There is no default key: make one with
+new_authkey, keep it in a file only its owner can read, and give it to
+both ends.
+
+Samples come from the same per-sample streams as a seeded
+sample_towersToFill, so a request gives the same list as
+sample_towersToFill(L, W, n, seed=seed). Requests without a seed get a
+fresh one and are not shared.
+
+:@funct new_authkey: make a random key, optionally saved to a file
+:@funct read_authkey: read a key saved by new_authkey
+:@funct start_service: start the worker pool and, optionally, a listener
+:@funct submit_towersToFill: stream the results of one request
+:@funct submit_batch: stream the results of several requests
+:@funct request_towersToFill: send requests to a listening service
+:@funct stop_service: shut a service down
+'''
+
+import commtower as ct
+
+
+BLOCK_SIZE = 8
+AUTHKEY_BYTES = 32
+
+
+def new_authkey(path=None):
+    '''
+    Makes a random key for a listening service. Given a path, the key
+    is also written to a new file that only its owner can read.
+    
+    :@param path: str, key file to create; must not exist yet
+    :@return: bytes, the key
+    '''
+    import os
+    
+    authkey = os.urandom(AUTHKEY_BYTES)
+    if path is not None:
+        keyFile = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            os.write(keyFile, authkey)
+        finally:
+            os.close(keyFile)
+    return authkey
+
+
+
+def read_authkey(path):
+    '''
+    Reads a key written by new_authkey. The file must not be readable
+    by anyone but its owner.
+    
+    :@param path: str, key file
+    :@return: bytes, the key
+    '''
+    import os
+    
+    assert os.stat(path).st_mode & 0o077 == 0, \
+           "Key file %s is readable by other users" % path
+    with open(path, 'rb') as keyFile:
+        authkey = keyFile.read()
+    assert len(authkey) > 0, "Key file %s is empty" % path
+    return authkey
+
+
+
+def start_service(workers=None, address=None, authkey=None, \
+                  blockSize=BLOCK_SIZE, checks=None):
+    '''
+    Starts a service: a pool of worker processes and, given an address,
+    a thread accepting client connections on it.
+    
+    :@param workers: int, worker processes; None for one per CPU
+    :@param address: tuple, (host, port) to listen on; optional
+    :@param authkey: bytes, key clients must present; needed with an
+                     address, see new_authkey
+    :@param blockSize: int, samples per pool task
+    :@param checks: str, check level passed on to plot_ntowers
+    :@return: dict, service state for the other functions
+    '''
+    import multiprocessing
+    import threading
+    import numpy as np
+    
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    assert isinstance(workers, int) and workers > 0, \
+           "workers must be a positive integer."
+    assert isinstance(blockSize, int) and blockSize > 0, \
+           "blockSize must be a positive integer."
+    assert address is None or authkey, \
+           "A listening service needs an authkey; see new_authkey"
+    
+    service = {'pool': multiprocessing.Pool(workers), \
+               'lock': threading.Lock(), 'jobs': {}, \
+               'blockSize': blockSize, 'checks': checks, \
+               'rng': np.random.RandomState(), 'listener': None, \
+               'address': address, 'authkey': authkey, 'open': True}
+    
+    if address is not None:
+        from multiprocessing.connection import Listener
+        
+        service['listener'] = Listener(address, authkey=authkey)
+        listenThread = threading.Thread(target=_serve, args=(service,))
+        listenThread.daemon = True
+        listenThread.start()
+    return service
+
+
+
+def _claim(service, L, W, n, seed, engine, method):
+    '''
+    Registers a request with the service and schedules the blocks it
+    needs that no earlier request has scheduled.
+    
+    :@param service: dict, from start_service
+    :@return: tuple, (job key, list of AsyncResults of the blocks)
+    '''
+    for funVars in [L, W, n]:
+        assert isinstance(funVars, int) and funVars > 0, \
+               "%s must be a positive integer." % (funVars)
+    assert service['open'], "Service was stopped"
+    
+    blockSize = service['blockSize']
+    with service['lock']:
+        if seed is None:
+            seed = int( service['rng'].randint(0, 2**31 - 1) )
+        key = (L, W, seed, engine, method)
+        job = service['jobs'].setdefault(key, {'blocks': [], 'users': 0})
+        job['users'] += 1
+        
+        nBlocks = -(-n // blockSize)
+        for k in range(len(job['blocks']), nBlocks):
+            args = (L, W, seed, k * blockSize, (k + 1) * blockSize, \
+                    engine, method, service['checks'])
+            job['blocks'].append( \
+                service['pool'].apply_async(ct._sample_block, (args,)) )
+        return key, job['blocks'][:nBlocks]
+
+
+
+def _release(service, key):
+    '''
+    Ends a request; a job nobody is waiting on is dropped, so later
+    requests start from scratch and memory doesn't grow.
+    
+    :@param service: dict, from start_service
+    :@param key: tuple, job key from _claim
+    '''
+    with service['lock']:
+        job = service['jobs'][key]
+        job['users'] -= 1
+        if job['users'] == 0:
+            del service['jobs'][key]
+
+
+
+def _claim_all(service, requests):
+    '''
+    Claims every request of a batch, or none if one of them is bad.
+    
+    :@param service: dict, from start_service
+    :@param requests: list, (L, W, n[, seed[, engine[, method]]]) tuples
+    :@return: list, (job key, block AsyncResults, n) per request
+    '''
+    claims = []
+    try:
+        for request in requests:
+            L, W, n, seed, engine, method = \
+                tuple(request) + (None, 'rect', 'sweep')[len(request) - 3:]
+            key, blocks = _claim(service, L, W, n, seed, engine, method)
+            claims.append( (key, blocks, n) )
+    except Exception:
+        for key, blocks, n in claims:
+            _release(service, key)
+        raise
+    return claims
+
+
+
+def _stream_claims(service, claims):
+    '''
+    Yields the results of claimed requests a block at a time, request
+    by request and in sample order, waiting for each block to finish.
+    
+    :@param service: dict, from start_service
+    :@param claims: list, from _claim_all
+    :@return: generator, (request index, list of results) pairs
+    '''
+    for i, (key, blocks, n) in enumerate(claims):
+        for k, block in enumerate(blocks):
+            yield i, block.get()[:n - k * service['blockSize']]
+
+
+
+class _ClaimStream(object):
+    '''
+    Iterator over items made from the results of claimed requests. The
+    claims are released once it is used up, fails, is closed or is
+    garbage collected, so a stream that is dropped without ever being
+    started doesn't keep its jobs in the service.
+    '''
+    
+    def __init__(self, service, claims, items):
+        '''
+        :@param service: dict, from start_service
+        :@param claims: list, from _claim_all
+        :@param items: iterator, made from _stream_claims of the claims
+        '''
+        self.service = service
+        self.claims = claims
+        self.items = items
+    
+    def __iter__(self):
+        return self
+    
+    def next(self):
+        try:
+            return next(self.items)
+        except BaseException: #StopIteration included
+            self.close()
+            raise
+    
+    __next__ = next
+    
+    def close(self):
+        '''
+        Releases the claims; later calls do nothing.
+        '''
+        claims, self.claims = self.claims, []
+        for key, blocks, n in claims:
+            _release(self.service, key)
+    
+    def __del__(self):
+        self.close()
+
+
+
+def submit_towersToFill(service, L, W, n=100, seed=None, engine='rect', \
+                        method='sweep'):
+    '''
+    Requests n samples from the service. The work is scheduled at once;
+    the returned iterator yields the number of towers used by each
+    sample as its block finishes. The service drops the job once the
+    iterator is used up, closed or deleted.
+    
+    :@param service: dict, from start_service
+    :@param L: int, length dimension of the plot
+    :@param W: int, width dimension of the plot
+    :@param n: int, number of samples
+    :@param seed: int, master seed for per-sample streams; optional
+    :@param engine: str, tower pipeline passed on to plot_ntowers
+    :@param method: str, rectangle trimming passed on to plot_ntowers
+    :@return: iterator, towers used for each sample, in order; has close
+    '''
+    claims = _claim_all(service, [ (L, W, n, seed, engine, method) ])
+    return _ClaimStream(service, claims, \
+                        ( result for i, chunk in _stream_claims(service, \
+                                                                claims) \
+                          for result in chunk ))
+
+
+
+def submit_batch(service, requests):
+    '''
+    Requests several sets of samples at once. Every request is scheduled
+    before any result is waited on, so the pool works on all of them
+    together. Results are yielded request by request, each in sample
+    order. As for submit_towersToFill, the jobs are dropped once the
+    iterator is used up, closed or deleted.
+    
+    :@param service: dict, from start_service
+    :@param requests: list, (L, W, n[, seed[, engine[, method]]]) tuples
+    :@return: iterator, (request index, towers used) pairs; has close
+    '''
+    claims = _claim_all(service, requests)
+    return _ClaimStream(service, claims, \
+                        ( (i, result) for i, chunk \
+                          in _stream_claims(service, claims) \
+                          for result in chunk ))
+
+
+
+def _serve(service):
+    '''
+    Accepts client connections until the service stops, handing each
+    to its own thread.
+    
+    :@param service: dict, from start_service
+    '''
+    import threading
+    from multiprocessing import AuthenticationError
+    
+    while service['open']:
+        try:
+            conn = service['listener'].accept()
+        except (IOError, OSError, EOFError, AuthenticationError):
+            continue #a client that failed to connect or had a wrong key
+        if not service['open']: #the wake-up call from stop_service
+            conn.close()
+            break
+        clientThread = threading.Thread(target=_handle_client, \
+                                        args=(service, conn))
+        clientThread.daemon = True
+        clientThread.start()
+
+
+
+def _handle_client(service, conn):
+    '''
+    Answers the requests of one client connection. Each message is a
+    list of request tuples, as for submit_batch. Answers are
+    ('result', request index, list of results) messages, one per
+    block, then ('done',), or ('error', message) if the batch failed.
+    
+    :@param service: dict, from start_service
+    :@param conn: Connection, from the listener
+    '''
+    try:
+        while True:
+            try:
+                requests = conn.recv()
+            except (EOFError, IOError):
+                break #client hung up
+            try:
+                claims = _claim_all(service, requests)
+                chunks = _ClaimStream(service, claims, \
+                                      _stream_claims(service, claims))
+                try:
+                    for i, chunk in chunks:
+                        conn.send( ('result', i, chunk) )
+                finally:
+                    chunks.close()
+                conn.send( ('done',) )
+            except (EOFError, IOError):
+                break
+            except Exception as error:
+                conn.send( ('error', repr(error)) )
+    finally:
+        conn.close()
+
+
+
+def request_towersToFill(address, requests, authkey):
+    '''
+    Sends a batch of requests to a service listening at address and
+    yields the results as the service streams them back.
+    
+    :@param address: tuple, (host, port) the service listens on
+    :@param requests: list, (L, W, n[, seed[, engine[, method]]]) tuples
+    :@param authkey: bytes, key the service was started with; see
+                     read_authkey
+    :@return: generator, (request index, towers used) pairs
+    '''
+    from multiprocessing.connection import Client
+    
+    conn = Client(address, authkey=authkey)
+    try:
+        conn.send( [ tuple(request) for request in requests ] )
+        while True:
+            message = conn.recv()
+            if message[0] == 'done':
+                break
+            elif message[0] == 'error':
+                raise RuntimeError("Service error: %s" % message[1])
+            for result in message[2]:
+                yield message[1], result
+    finally:
+        conn.close()
+
+
+
+def stop_service(service):
+    '''
+    Stops a service: no new requests are taken, the listener is closed
+    and the worker pool is shut down.
+    
+    :@param service: dict, from start_service
+    '''
+    service['open'] = False
+    if service['listener'] is not None:
+        from multiprocessing.connection import Client
+        
+        try: #wake the accepting thread so it sees the service closed
+            Client(service['address'], \
+                   authkey=service['authkey']).close()
+        except (IOError, OSError, EOFError):
+            pass
+        service['listener'].close()
+    service['pool'].terminate()
+    service['pool'].join()
+
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import time
+    
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=6070)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--block', type=int, default=BLOCK_SIZE)
+    parser.add_argument('--authkey', required=True, \
+                        help='key file; made with a new random key if '
+                             'missing, readable by its owner only')
+    args = parser.parse_args()
+    
+    if os.path.exists(args.authkey):
+        authkey = read_authkey(args.authkey)
+    else:
+        authkey = new_authkey(args.authkey)
+    service = start_service(args.workers, (args.host, args.port), \
+                            authkey, args.block)
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        stop_service(service)